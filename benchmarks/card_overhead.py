@@ -0,0 +1,59 @@
+"""Compare the per-card cost of the prepareQA filter with night mode off against a vanilla Anki.
+
+Run with: python3 -m benchmarks.card_overhead
+"""
+from anki_testing import anki_running
+
+from .helpers import measure, report, switch_night_mode
+
+
+RENDERS = 1000
+# allowed difference between night mode off and vanilla Anki (noise of the timings)
+TOLERANCE = 0.1
+
+
+def render_cards(card):
+    from anki.hooks import runFilter
+
+    html = card.q()
+
+    def run():
+        for i in range(RENDERS):
+            runFilter('prepareQA', html, card, 'reviewQuestion')
+
+    return run
+
+
+def main():
+    with anki_running():
+        from aqt import mw
+        from night_mode.night_mode import NightMode
+
+        note = mw.col.newNote()
+        note['Front'] = '<div>Some <font color="#000000">question</font></div>'
+        note['Back'] = 'Answer'
+        mw.col.addNote(note)
+        card = note.cards()[0]
+
+        vanilla = measure(render_cards(card))
+
+        app = NightMode()
+        switch_night_mode(app, True)
+        night_mode_on = measure(render_cards(card))
+
+        switch_night_mode(app, False)
+        night_mode_off = measure(render_cards(card))
+
+        report(f'Rendering {RENDERS} cards:', {
+            'vanilla Anki': vanilla,
+            'night mode on': night_mode_on,
+            'night mode off': night_mode_off
+        })
+
+        assert night_mode_off <= vanilla * (1 + TOLERANCE), (
+            f'night mode off is {night_mode_off / vanilla - 1:.1%} slower than vanilla Anki'
+        )
+
+
+if __name__ == '__main__':
+    main()
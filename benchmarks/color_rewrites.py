@@ -0,0 +1,63 @@
+"""Compare the CSS and the regex strategies of colors rewriting.
+
+Run with: python3 -m benchmarks.color_rewrites
+"""
+from anki_testing import anki_running
+
+from .helpers import measure, page_load_time, report
+
+
+DECKS = 2000
+CARD_PARAGRAPHS = 2000
+
+
+def deck_browser_page():
+    row = (
+        '<tr class="deck"><td class="decktd"><a class="deck">Deck {i}</a></td>'
+        '<td align=right><font color="#000099">{i}</font></td>'
+        '<td align=right><font color="#C35617">{i}</font></td>'
+        '<td align=right><font color="#007700">{i}</font></td></tr>'
+    )
+    return '<table>' + ''.join(row.format(i=i) for i in range(DECKS)) + '</table>'
+
+
+def reviewer_page():
+    paragraph = (
+        '<div>Some <font color="#000000">black</font> text, '
+        '<span style="color:#070">green</span> and <font color="#00a">blue</font></div>'
+    )
+    return '<div class="card">' + paragraph * CARD_PARAGRAPHS + '</div>'
+
+
+def benchmark(name, html, rewrites, elements):
+    from night_mode.color_rewrites import compile_css, rewrite_html, compile_regex
+
+    rewrites_tuple = tuple(rewrites.items())
+
+    def css_page():
+        return '<style>' + compile_css(rewrites, elements) + '</style>' + html
+
+    def regex_page():
+        compile_regex.cache_clear()
+        return rewrite_html(html, rewrites_tuple, elements)
+
+    report(name, {
+        'compile CSS': measure(lambda: compile_css(rewrites, elements)),
+        'rewrite HTML (regex)': measure(regex_page),
+        'load page (CSS strategy)': page_load_time(css_page()),
+        'load page (regex strategy)': page_load_time(regex_page())
+    })
+
+
+def main():
+    with anki_running():
+        from night_mode.color_rewrites import DEFAULT_REWRITES
+
+        benchmark(f'Deck browser with {DECKS} decks', deck_browser_page(), DEFAULT_REWRITES, ('font', 'span'))
+
+        user_color_map = {'#000000': 'white', '#00a': '#00BBFF', '#070': '#00CC00'}
+        benchmark(f'Reviewer with {CARD_PARAGRAPHS} paragraphs', reviewer_page(), user_color_map, ('font', 'span'))
+
+
+if __name__ == '__main__':
+    main()
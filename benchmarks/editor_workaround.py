@@ -0,0 +1,127 @@
+"""Measure keystroke latency of the white background workaround in a 50 KB field.
+
+The "before" variant reproduces the previous algorithm: a regex over
+the whole field HTML followed by replacement of innerHTML (and of the
+caret position) after each deletion.
+
+Run with: python3 -m benchmarks.editor_workaround
+"""
+from anki_testing import anki_running
+
+from .helpers import run_javascript, wait_for
+
+
+FIELD_SIZE = 50 * 1024
+KEYSTROKES = 200
+
+PAGE = """
+<html><body>
+<div id="fields"><div class="field" contenteditable="true">%s</div></div>
+</body></html>
+"""
+
+LEGACY_WORKAROUND = r"""
+var regex = /<(span|strong) style="background-color: rgb\(255, 255, 255\);">(.*?)<\/(span|strong)>/gm
+window.after_keystroke = function(field)
+{
+    var html = field.innerHTML
+    if(html.search(regex) == -1)
+        return
+    var selection = window.getSelection()
+    var range = selection.getRangeAt(0)
+    range.setStart(field, 0)
+    var len = range.toString().length
+    field.innerHTML = html.replace(regex, '<$1>$2</$1>')
+    var walker = document.createTreeWalker(field, NodeFilter.SHOW_TEXT)
+    var node = walker.nextNode()
+    while(node && len > node.textContent.length)
+    {
+        len -= node.textContent.length
+        node = walker.nextNode()
+    }
+    range = new Range()
+    range.setStart(node, Math.min(len, node.textContent.length))
+    selection.removeAllRanges()
+    selection.addRange(range)
+}
+"""
+
+KEYSTROKES_SCRIPT = """
+(function()
+{
+    var field = document.querySelector('.field')
+    var timings = []
+    window.benchmark_result = null
+
+    function keystroke(i)
+    {
+        if(i == %(keystrokes)s)
+        {
+            timings.sort(function(a, b){ return a - b })
+            window.benchmark_result = timings[Math.floor(timings.length / 2)]
+            return
+        }
+        field.focus()
+        var range = new Range()
+        range.selectNodeContents(field)
+        range.collapse(false)
+        window.getSelection().removeAllRanges()
+        window.getSelection().addRange(range)
+
+        var start = performance.now()
+        document.execCommand('insertHTML', false, '<span style="background-color: rgb(255, 255, 255);">x</span>')
+        document.execCommand('delete')
+        if(window.after_keystroke)
+            window.after_keystroke(field)
+        // let the mutation observers run before taking the measurement
+        Promise.resolve().then(function()
+        {
+            timings.push(performance.now() - start)
+            keystroke(i + 1)
+        })
+    }
+    keystroke(0)
+})()
+"""
+
+
+def field_content():
+    paragraph = '<div>Lorem ipsum <b>dolor</b> sit amet, <span style="color: red">consectetur</span></div>'
+    return paragraph * (FIELD_SIZE // len(paragraph))
+
+
+def keystroke_latency(view, install_script):
+    from PyQt5.QtCore import QEventLoop
+
+    loop = QEventLoop()
+    view.loadFinished.connect(loop.quit)
+    view.setHtml(PAGE % field_content())
+    loop.exec_()
+    view.loadFinished.disconnect(loop.quit)
+
+    run_javascript(view, install_script)
+    run_javascript(view, KEYSTROKES_SCRIPT % {'keystrokes': KEYSTROKES})
+    return wait_for(view, 'window.benchmark_result')
+
+
+def main():
+    with anki_running():
+        from PyQt5.QtWebEngineWidgets import QWebEngineView
+        from night_mode.editors import BackgroundWorkaround
+
+        view = QWebEngineView()
+        view.show()
+
+        before = keystroke_latency(view, LEGACY_WORKAROUND)
+        after = keystroke_latency(
+            view,
+            BackgroundWorkaround.install_script + 'window.nightModeBackgroundWorkaround.enable()'
+        )
+
+        print(f'Median keystroke latency in a {FIELD_SIZE // 1024} KB field:')
+        print(f'    before (regex over innerHTML): {before:8.3f} ms')
+        print(f'    after (MutationObserver):      {after:8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
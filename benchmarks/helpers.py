@@ -0,0 +1,77 @@
+from statistics import median
+from time import perf_counter
+
+
+def measure(function, repeat=20):
+    """Median time (in milliseconds) of calling the function."""
+    timings = []
+    for i in range(repeat):
+        start = perf_counter()
+        function()
+        timings.append((perf_counter() - start) * 1000)
+    return median(timings)
+
+
+def page_load_time(html, repeat=10):
+    """Median time (in milliseconds) of loading given HTML into a web view."""
+    from PyQt5.QtCore import QEventLoop
+    from PyQt5.QtWebEngineWidgets import QWebEngineView
+
+    view = QWebEngineView()
+    view.resize(1024, 768)
+    view.show()
+
+    def load():
+        loop = QEventLoop()
+        view.loadFinished.connect(loop.quit)
+        view.setHtml(html)
+        loop.exec_()
+        view.loadFinished.disconnect(loop.quit)
+
+    try:
+        return measure(load, repeat)
+    finally:
+        view.close()
+
+
+def switch_night_mode(app, enabled):
+    """Turn night mode on or off as the menu toggle does (the state setting is read-only)."""
+    app.profile_loaded = True
+    app.config.enable_night_mode.value = enabled
+    app.refresh()
+    assert app.config.state_on.value == enabled
+
+
+def report(title, results):
+    print(title)
+    for name, value in results.items():
+        print(f'    {name:<40} {value:10.3f} ms')
+
+
+def run_javascript(view, javascript):
+    """Run the script in the page of given web view and wait for the result."""
+    from PyQt5.QtCore import QEventLoop
+
+    loop = QEventLoop()
+    result = []
+
+    def callback(value):
+        result.append(value)
+        loop.quit()
+
+    view.page().runJavaScript(javascript, callback)
+    loop.exec_()
+    return result[0]
+
+
+def wait_for(view, javascript, interval=10):
+    """Wait (processing Qt events) until the script evaluates to a truthy value."""
+    from PyQt5.QtCore import QEventLoop, QTimer
+
+    while True:
+        value = run_javascript(view, javascript)
+        if value:
+            return value
+        loop = QEventLoop()
+        QTimer.singleShot(interval, loop.quit)
+        loop.exec_()
@@ -0,0 +1,65 @@
+"""Compare time of painting the Browser table (with 10k rows) under each of the styling engines.
+
+Run with: python3 -m benchmarks.table_painting
+"""
+from anki_testing import anki_running
+
+from .helpers import measure, report, switch_night_mode
+
+
+NOTES = 10000
+
+
+def add_notes(collection, count):
+    for i in range(count):
+        note = collection.newNote()
+        note['Front'] = f'Question {i}'
+        note['Back'] = f'Answer {i}'
+        collection.addNote(note)
+
+
+def scroll_through(table):
+    """Paint every page of the table, from the top to the bottom."""
+    scroll_bar = table.verticalScrollBar()
+
+    def run():
+        for value in range(scroll_bar.minimum(), scroll_bar.maximum() + 1, scroll_bar.pageStep()):
+            scroll_bar.setValue(value)
+            table.viewport().repaint()
+
+    return run
+
+
+def main():
+    with anki_running():
+        from aqt import mw
+        from aqt.browser import Browser
+        from night_mode.night_mode import NightMode
+
+        add_notes(mw.col, NOTES)
+
+        app = NightMode()
+        switch_night_mode(app, True)
+
+        results = {}
+
+        for engine in ['widgets', 'application', 'native']:
+            app.config.styling_engine.value = engine
+            app.refresh(reload=True)
+
+            browser = Browser(mw)
+            browser.resize(1024, 768)
+            browser.form.searchEdit.lineEdit().setText('deck:*')
+            browser.onSearchActivated()
+
+            results[f'{engine} engine'] = measure(scroll_through(browser.form.tableView), repeat=5)
+
+            browser.close()
+
+        switch_night_mode(app, False)
+
+        report(f'Painting all pages of the Browser table with {NOTES} rows:', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Count paints of a web view loading a dark page, with and without the page background set beforehand.
+
+Run with: python3 -m benchmarks.webview_paints
+"""
+from anki_testing import anki_running
+
+
+PAGE = """
+<html><head><style>body{background: #272828; color: white}</style></head>
+<body>%s</body></html>
+""" % ('<p>Some text</p>' * 100)
+
+LOADS = 10
+
+
+def count_paints(background=None):
+    from PyQt5.QtCore import QEvent, QEventLoop, QObject, QTimer
+    from PyQt5.QtGui import QColor
+    from PyQt5.QtWebEngineWidgets import QWebEngineView
+    from PyQt5.QtWidgets import QApplication, QWidget
+
+    class PaintCounter(QObject):
+        """Counts paints of the view and of its children.
+
+        The web engine paints through a child widget which is created
+        only when the first page loads, so the filter is installed on
+        the whole application rather than on the widget itself.
+        """
+        view = None
+        paints = 0
+
+        def eventFilter(self, obj, event):
+            if event.type() in (QEvent.Paint, QEvent.UpdateRequest) and isinstance(obj, QWidget):
+                if obj is self.view or self.view.isAncestorOf(obj):
+                    self.paints += 1
+            return False
+
+    application = QApplication.instance()
+    counter = PaintCounter()
+    total = 0
+
+    for i in range(LOADS):
+        view = QWebEngineView()
+        view.resize(800, 600)
+
+        if background:
+            view.page().setBackgroundColor(QColor(background))
+
+        counter.view = view
+        counter.paints = 0
+        application.installEventFilter(counter)
+
+        # the first load of a fresh view, as when a screen is opened
+        view.show()
+        loop = QEventLoop()
+        view.loadFinished.connect(loop.quit)
+        view.setHtml(PAGE)
+        loop.exec_()
+
+        # let the rendering settle
+        QTimer.singleShot(200, loop.quit)
+        loop.exec_()
+
+        application.removeEventFilter(counter)
+        total += counter.paints
+        view.close()
+
+    return total / LOADS
+
+
+def main():
+    with anki_running():
+        print(f'Average paints per page load ({LOADS} loads):')
+        print(f'    default (white) background: {count_paints():6.2f}')
+        print(f'    background set beforehand:  {count_paints("#272828"):6.2f}')
+
+
+if __name__ == '__main__':
+    main()
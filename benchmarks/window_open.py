@@ -0,0 +1,42 @@
+"""Compare time of opening dialogs styled by the widgets and by the application style sheet engines.
+
+Run with: python3 -m benchmarks.window_open
+"""
+from anki_testing import anki_running
+
+from .helpers import measure, report, switch_night_mode
+
+
+def open_and_close(window_class):
+    from aqt import mw
+
+    def run():
+        window = window_class(mw)
+        window.close()
+
+    return run
+
+
+def main():
+    with anki_running():
+        from aqt.addcards import AddCards
+        from aqt.browser import Browser
+        from night_mode.night_mode import NightMode
+
+        app = NightMode()
+        switch_night_mode(app, True)
+
+        for engine in ['widgets', 'application']:
+            app.config.styling_engine.value = engine
+            app.refresh(reload=True)
+
+            report(f'Opening windows, {engine} engine:', {
+                'Browser': measure(open_and_close(Browser), repeat=10),
+                'AddCards': measure(open_and_close(AddCards), repeat=10)
+            })
+
+        switch_night_mode(app, False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""Pre-compile styles for the default settings into night_mode/bundles/default.json
+
+so that a fresh install does not need to build any CSS before the first paint.
+Requires Anki (set up with anki_testing, the same way as for tests).
+"""
+from os import makedirs
+from os.path import dirname
+
+from anki_testing import anki_running
+
+
+def build_default_bundle():
+    with anki_running():
+        from night_mode.bundles import DEFAULT_BUNDLE
+        from night_mode.night_mode import NightMode
+
+        app = NightMode()
+        bundle = app.theme_bundle
+
+        # start from scratch, ignoring any previously built bundles
+        bundle.fingerprint = app.config.fingerprint
+        bundle.styles = {}
+        bundle.compile_all()
+
+        makedirs(dirname(DEFAULT_BUNDLE), exist_ok=True)
+        bundle.write(DEFAULT_BUNDLE)
+
+
+if __name__ == '__main__':
+    build_default_bundle()
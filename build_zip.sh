@@ -1,4 +1,5 @@
 #!/bin/bash
+python3 build_bundle.py || echo "Warning: the default theme bundle could not be built"
 cd night_mode
-zip -r night_mode.zip * -x __pycache__/* -x __pycache__/
+zip -r night_mode.zip * -x __pycache__/* -x __pycache__/ -x user_files/bundles/* -x user_files/styles/*
 cp night_mode.zip ..
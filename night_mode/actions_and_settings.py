@@ -1,25 +1,41 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from PyQt5.QtCore import QTimer
 from PyQt5.QtGui import QColor
 from PyQt5.QtWidgets import QColorDialog
 
+from .cards import is_trivial
+from .color_rewrites import DEFAULT_REWRITES
 from .internals import Setting, MenuAction, alert
+from .maintenance import WhiteBackgroundsCleaner
 from .color_map import ColorMapWindow
 from .mode import ModeWindow
+from .overrides import OverridesWindow
 from .selector import StylersSelectorWindow
 
 
-class UserColorMap(Setting, MenuAction):
-    value = {'#000000': 'white'}
+class SettingWithWindow:
+    """Mixin for settings edited in a window which holds a reference to the (mutable) value"""
     window = None
+
+    def on_import(self):
+        # the window would modify the old value; a new one will be created
+        if self.window:
+            self.window.close()
+            self.window = None
+
+
+class UserColorMap(SettingWithWindow, Setting, MenuAction):
+    value = {'#000000': 'white'}
+    affects_style = True
+    arbitrary_keys = True
     label = 'Customise colors on cards'
 
     def action(self):
         from aqt import mw as main_window
         if not self.window:
             # self.value is mutable, any modifications done by ColorMapWindow
-            # will be done on the value of this singleton class object
+            # will be done on the value of this setting
             self.window = ColorMapWindow(
                 main_window,
                 self.value,
@@ -28,6 +44,100 @@ class UserColorMap(Setting, MenuAction):
         self.window.show()
 
     def on_colors_changed(self):
+        self.app.refresh_scheduler.request()
+
+
+class ColorRewrites(SettingWithWindow, Setting, MenuAction):
+    """Table of colors used by Anki screens (e.g. deck browser) and their night replacements"""
+    value = dict(DEFAULT_REWRITES)
+    affects_style = True
+    arbitrary_keys = True
+    label = 'Customise colors in Anki screens'
+
+    def action(self):
+        from aqt import mw as main_window
+        if not self.window:
+            self.window = ColorMapWindow(
+                main_window,
+                self.value,
+                title='Customise colors of Anki screens',
+                header='Specify how colors used by Anki (e.g. in the decks list) should be swapped.',
+                on_update=self.on_colors_changed
+            )
+        self.window.show()
+
+    def on_colors_changed(self):
+        self.app.refresh_scheduler.request()
+
+
+class CardOverrides(SettingWithWindow, Setting, MenuAction):
+    """Styles of cards of particular note types and decks, overriding the global settings.
+
+    For example, images of image occlusion note types should not be inverted.
+    Overrides of note types take precedence over overrides of decks.
+    """
+    value = {'notetypes': {}, 'decks': {}}
+    affects_style = True
+    label = 'Customise note types and decks'
+
+    def action(self):
+        from aqt import mw as main_window
+
+        if not self.window:
+            self.window = OverridesWindow(
+                main_window,
+                self.value,
+                note_types=sorted(
+                    ((model['id'], model['name']) for model in main_window.col.models.all()),
+                    key=lambda model: model[1]
+                ),
+                decks=sorted(
+                    ((deck['id'], deck['name']) for deck in main_window.col.decks.all()),
+                    key=lambda deck: deck[1]
+                ),
+                on_update=self.on_overrides_changed
+            )
+        self.window.show()
+
+    def on_overrides_changed(self):
+        self.app.refresh_scheduler.request()
+
+    def for_card(self, mid, did):
+        """Merged overrides for cards of given note type and deck, or None if there are none."""
+        note_type = self.value.get('notetypes', {}).get(str(mid))
+        deck = self.value.get('decks', {}).get(str(did))
+
+        if not (note_type or deck):
+            return None
+
+        overrides = dict(deck or {})
+        overrides.update(note_type or {})
+        return overrides
+
+
+class AdaptNoteTypesCss(Setting, MenuAction):
+    """Add dark variants of the colors declared in the CSS of note types (see notetypes.py)"""
+    value = False
+    affects_style = True
+    label = 'Adapt colors of note types styling'
+    checkable = True
+
+    def action(self):
+        self.value = not self.value
+        if self.value:
+            self.app.notetypes.analyze_all()
+        self.app.refresh()
+
+
+class RewriteColorsInHtml(Setting, MenuAction):
+    """Rewrite the customised colors in the HTML of cards instead of overriding them with CSS."""
+    value = False
+    affects_style = True
+    label = 'Rewrite colors in cards HTML'
+    checkable = True
+
+    def action(self):
+        self.value = not self.value
         self.app.refresh()
 
 
@@ -39,6 +149,7 @@ class InvertImage(Setting, MenuAction):
 
     # setting
     value = False
+    affects_style = True
 
     # menu action
     label = '&Invert images'
@@ -56,6 +167,7 @@ class InvertLatex(Setting, MenuAction):
     To learn how formulas are inverted check also append_to_styles().
     """
     value = False
+    affects_style = True
     label = 'Invert &latex'
     checkable = True
 
@@ -114,6 +226,8 @@ class TransparentLatex(Setting, MenuAction):
 
 class ColorAction(Setting, MenuAction):
 
+    affects_style = True
+
     def action(self):
         qt_color_old = QColor(self.value)
         qt_color = QColorDialog.getColor(qt_color_old)
@@ -181,15 +295,88 @@ class About(MenuAction):
 class EnableInDialogs(Setting, MenuAction):
     """Switch for night mode in dialogs"""
     value = True
+    affects_style = True
     label = 'Enable in &dialogs'
     checkable = True
 
     def action(self):
         self.value = not self.value
+        self.app.refresh()
+
+
+class StylingEngine(Setting, MenuAction):
+    """How the dialogs are styled.
+
+    widgets: style sheets are set on each window (and some of its widgets) when it opens
+    application: a single style sheet is set on the application when night mode is switched on
+    native: a dark palette and a proxy style, without style sheets (the fastest painting)
+    """
+    value = 'widgets'
+    label = 'Dialogs styling engine'
+
+    engines = {
+        'widgets': 'Style each window when it opens',
+        'application': 'Use a single application style sheet (faster opening of windows)',
+        'native': 'Use a dark palette instead of style sheets (faster painting)'
+    }
+
+    def action(self):
+        from aqt.utils import chooseList
+
+        engines = list(self.engines)
+        choice = chooseList(
+            'How should the dialogs be styled?',
+            [self.engines[engine] for engine in engines],
+            startrow=engines.index(self.value) if self.value in engines else 0
+        )
+        self.value = engines[choice]
+        self.app.refresh(reload=True)
+
+
+class CssInjection(Setting, MenuAction):
+    """How the CSS reaches the screens of the main window (deck browser, overview, reviewer, toolbar).
+
+    html: the CSS is appended to the HTML of every rendered page
+    scripts: the CSS is installed once (per theme) as a script run on creation of every document
+    files: the CSS is written into files which are linked from the pages (and cached by the web engine)
+    """
+    value = 'html'
+    label = 'Web styles injection'
+
+    modes = {
+        'html': 'Append styles to the HTML of each page',
+        'scripts': 'Inject styles with a script, leaving the HTML of pages untouched',
+        'files': 'Link styles from files, cached between pages'
+    }
+
+    def action(self):
+        from aqt.utils import chooseList
+
+        modes = list(self.modes)
+        choice = chooseList(
+            'How should the styles be injected into the screens of the main window?',
+            [self.modes[mode] for mode in modes],
+            startrow=modes.index(self.value) if self.value in modes else 0
+        )
+        self.value = modes[choice]
+        self.app.refresh(reload=True)
+
+
+class Extensions(Setting):
+    """Descriptions of CSS and QSS fragments registered by other add-ons (see api.py).
+
+    Not stored: add-ons register the fragments in every session;
+    it is a setting so the fragments are a part of the fingerprint of styles.
+    """
+    value = {}
+    affects_style = True
+    persistent = False
+    arbitrary_keys = True
 
 
 class StyleScrollBars(Setting, MenuAction):
     value = True
+    affects_style = True
     label = 'Dark Scroll Bars'
     checkable = True
 
@@ -198,13 +385,15 @@ class StyleScrollBars(Setting, MenuAction):
         self.app.refresh()
 
 
-class ModeSettings(Setting, MenuAction):
+class ModeSettings(SettingWithWindow, Setting, MenuAction):
     value = {
         'mode': 'manual',
         'start_at': '21:30',
-        'end_at': '07:30'
+        'end_at': '07:30',
+        # the screens are dimmed gradually, in steps, for given number of minutes before the start
+        'dusk_minutes': 0,
+        'dusk_steps': 5
     }
-    window = None
     label = 'Start automatically'
     checkable = True
 
@@ -221,7 +410,7 @@ class ModeSettings(Setting, MenuAction):
 
         if not self.window:
             # self.value is mutable, any modifications done by ColorMapWindow
-            # will be done on the value of this singleton class object
+            # will be done on the value of this setting
             self.window = ModeWindow(
                 main_window,
                 self.value,
@@ -231,7 +420,20 @@ class ModeSettings(Setting, MenuAction):
         self.app.update_menu()
 
     def update(self):
-        self.app.refresh()
+        self.app.dusk.prepare(self.dusk_steps)
+        self.app.refresh_scheduler.request()
+
+    def on_load(self):
+        self.app.dusk.prepare(self.dusk_steps)
+
+    @property
+    def dusk_minutes(self):
+        # settings stored by older versions do not have the dusk
+        return self.value.get('dusk_minutes', 0)
+
+    @property
+    def dusk_steps(self):
+        return self.value.get('dusk_steps', 5)
 
     @property
     def is_active(self):
@@ -246,6 +448,52 @@ class ModeSettings(Setting, MenuAction):
     def time(self, which):
         return datetime.strptime(self.value[which], '%H:%M').time()
 
+    def next_moment(self, which, now):
+        moment = datetime.combine(now.date(), self.time(which))
+        if moment <= now:
+            moment += timedelta(days=1)
+        return moment
+
+    def next_transition(self, now=None):
+        """The nearest moment (after now) at which the automatic mode switches the state or dims the screens"""
+        now = now or datetime.now()
+        start = self.next_moment('start_at', now)
+        moments = [start, self.next_moment('end_at', now)]
+
+        moments.extend(
+            moment
+            for moment in self.dusk_moments(start)
+            if moment > now
+        )
+
+        return min(moments)
+
+    def dusk_moments(self, start):
+        """Beginnings of the steps of the dusk preceding given start of the night mode"""
+        if not self.dusk_minutes:
+            return []
+
+        window = timedelta(minutes=self.dusk_minutes)
+        steps = self.dusk_steps
+        return [
+            start - window + window * step / steps
+            for step in range(steps)
+        ]
+
+    def dusk_step(self, now=None):
+        """The step of the dusk (from 1 to dusk_steps) at given moment, or 0 outside of the dusk"""
+        if self.mode != 'auto':
+            return 0
+
+        now = now or datetime.now()
+        start = self.next_moment('start_at', now)
+
+        return sum(
+            1
+            for moment in self.dusk_moments(start)
+            if moment <= now
+        )
+
 
 class EnableNightMode(Setting, MenuAction):
     """Switch night mode"""
@@ -287,6 +535,7 @@ class StateSetting(Setting):
     """
     name = 'state_on'
     state = None
+    persistent = False
 
     require = {
         ModeSettings,
@@ -304,25 +553,44 @@ class StateSetting(Setting):
     def value(self, value):
         pass
 
+    # the longest wait for a transition, so changes of the system clock
+    # (or waking up from sleep) are noticed within a few minutes
+    max_interval = 5 * 60 * 1000
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # check the state every 60 seconds
-        # (maybe a bit suboptimal, but the most reliable)
+        # the timer runs only in the automatic mode, firing at the next transition
         from aqt import mw as main_window
         self.timer = QTimer(main_window)
-        self.timer.setInterval(60 * 100)  # 1000 milliseconds
-        self.timer.timeout.connect(self.maybe_enable_maybe_disable)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
 
     def on_load(self):
         if self.value:
             self.app.on()
 
         self.update_state()
-        self.timer.start()
+        self.schedule()
 
     def on_save(self):
         self.timer.stop()
 
+    def schedule(self):
+        """Start the timer for the next transition of the automatic mode, or stop it in the manual mode."""
+        if self.mode_settings.mode != 'auto':
+            self.timer.stop()
+            return
+
+        now = datetime.now()
+        wait = (self.mode_settings.next_transition(now) - now).total_seconds() * 1000
+        # a moment after the transition, so the new state is already in effect
+        self.timer.start(int(min(wait + 1000, self.max_interval)))
+
+    def on_timeout(self):
+        self.maybe_enable_maybe_disable()
+        self.app.update_dusk()
+        self.schedule()
+
     def maybe_enable_maybe_disable(self):
         if self.value != self.state:
             self.app.refresh()
@@ -332,10 +600,123 @@ class StateSetting(Setting):
         self.state = self.value
 
 
-class DisabledStylers(Setting, MenuAction):
+class CacheCards(Setting, MenuAction):
+    """Store cards after night mode transformations in a sidecar database"""
+    value = False
+    label = 'Cache cards'
+    checkable = True
+
+    def action(self):
+        self.value = not self.value
+
+
+class PrefetchCards(Setting, MenuAction):
+    """Transform the upcoming cards in background during reviews"""
+    value = False
+    label = 'Prefetch upcoming cards'
+    checkable = True
+
+    def action(self):
+        self.value = not self.value
+        if not self.value:
+            self.app.prefetcher.clear()
+
+
+class PrefillCardsCache(MenuAction):
+    """Fill the cards cache for the current deck"""
+    label = 'Prepare cache for current deck'
+
+    def action(self):
+        from aqt import mw as main_window
+        from aqt.utils import tooltip
+
+        if not self.app.config.cache_cards.value:
+            alert('Enable the "Cache cards" option first.')
+            return
+
+        if is_trivial(self.app.cards.options):
+            alert(
+                'There is nothing to cache: the cards are transformed only when night mode is on '
+                'and the "Rewrite colors in cards HTML" option is enabled.'
+            )
+            return
+
+        deck_id = main_window.col.decks.selected()
+        count = self.app.cards_cache.prefill(self.app.cards, deck_id)
+        tooltip('Cached %s sides of cards' % count)
+
+
+class RemoveWhiteBackgrounds(MenuAction):
+    """Remove white backgrounds (left by editing in night mode) from all notes"""
+    label = 'Remove white backgrounds from notes...'
+
+    def action(self):
+        from aqt import mw as main_window
+        from aqt.utils import askUser, showInfo, tooltip
+
+        cleaner = WhiteBackgroundsCleaner(main_window.col, main_window.progress)
+        report = cleaner.run(dry_run=True)
+
+        if not report.notes:
+            showInfo('No white backgrounds found in %s inspected notes.' % report.candidates)
+            return
+
+        question = (
+            'Found %s white backgrounds in %s notes. '
+            'Remove them? This operation cannot be undone.'
+        ) % (report.elements, report.notes)
+
+        if askUser(question):
+            report = cleaner.run(dry_run=False)
+            main_window.reset()
+            tooltip('Removed %s white backgrounds from %s notes' % (report.elements, report.notes))
+
+
+class ExportTheme(MenuAction):
+    """Save all settings into a theme file"""
+    label = 'Export theme...'
+
+    def action(self):
+        from aqt import mw as main_window
+        from aqt.utils import getSaveFile, tooltip
+
+        path = getSaveFile(
+            main_window, 'Export Night Mode theme', 'night_mode_theme',
+            'Night Mode theme', '.json', 'night_mode_theme.json'
+        )
+        if path:
+            self.app.config.export_theme(path)
+            tooltip('Theme exported')
+
+
+class ImportTheme(MenuAction):
+    """Load settings from a theme file"""
+    label = 'Import theme...'
+
+    def action(self):
+        from aqt import mw as main_window
+        from aqt.utils import getFile, tooltip
+
+        path = getFile(
+            main_window, 'Import Night Mode theme', None,
+            filter='Night Mode theme (*.json)', key='night_mode_theme'
+        )
+        if not path:
+            return
+
+        try:
+            self.app.config.import_theme(path)
+        except (ValueError, OSError) as e:
+            alert('Could not import the theme: %s' % e)
+            return
+
+        self.app.refresh(reload=True)
+        tooltip('Theme imported')
+
+
+class DisabledStylers(SettingWithWindow, Setting, MenuAction):
 
     value = set()
-    window = None
     label = 'Choose what to style'
 
     def action(self):
@@ -351,4 +732,4 @@ class DisabledStylers(Setting, MenuAction):
         self.window.show()
 
     def update(self):
-        self.app.refresh(reload=True)
+        self.app.refresh_scheduler.request(reload=True)
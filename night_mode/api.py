@@ -0,0 +1,112 @@
+from collections import namedtuple
+
+from .scripts import WEB_VIEWS
+
+
+Fragment = namedtuple('Fragment', 'css web_view screens qss window')
+
+
+class NightModeApi:
+    """Interface for other add-ons, available as `mw.night_mode_api` once night mode is loaded.
+
+    Instead of restyling their screens and windows when night mode is toggled
+    (e.g. in a `night_mode_state_changed` hook), add-ons register fragments
+    of CSS (for web views of the main window) and of QSS (for their windows).
+    The fragments are compiled and cached along with the styles of night mode,
+    and applied in the same pass, so one refresh serves all the add-ons.
+    Registrations are coalesced into a single refresh too.
+
+    Example:
+
+        from aqt import mw
+        from anki.hooks import addHook
+
+        def register(api):
+            api.register(
+                'my_add_on',
+                css='.my-widget{color: white}',
+                web_view='web',
+                screens=('review',),
+                qss='QLabel{color: white}',
+                window=MyDialog
+            )
+
+        if hasattr(mw, 'night_mode_api'):
+            register(mw.night_mode_api)
+        else:
+            addHook('night_mode_api_ready', register)
+    """
+
+    version = 1
+
+    def __init__(self, app):
+        self.app = app
+        # name => Fragment
+        self.fragments = {}
+
+    @property
+    def is_on(self):
+        """Is night mode on? Querying the state does not refresh anything."""
+        return bool(self.app.config.state_on.value)
+
+    @property
+    def colors(self):
+        config = self.app.config
+        return {
+            'text': config.color_t.value,
+            'background': config.color_b.value,
+            'auxiliary_background': config.color_s.value,
+            'active': config.color_a.value
+        }
+
+    def register(self, name, css='', web_view='web', screens=None, qss='', window=None):
+        """Add (or replace) fragments of styles applied in night mode.
+
+        Args:
+            name: identifier of the fragments, e.g. the name of the add-on
+            css: CSS for pages of the web view of the main window
+            web_view: one of 'web', 'bottomWeb' and 'toolbarWeb'
+            screens: states of the main window (e.g. 'review', 'overview') in which the CSS
+                applies, or None for all of them
+            qss: Qt style sheet for the windows of given class
+            window: class of the windows (subclasses included)
+        """
+        if web_view not in WEB_VIEWS:
+            raise ValueError(f'Unknown web view: {web_view}, use one of: {", ".join(WEB_VIEWS)}')
+
+        if qss and window is None:
+            raise ValueError('The class of the window has to be given for QSS')
+
+        self.fragments[name] = Fragment(css, web_view, tuple(screens) if screens else None, qss, window)
+        self.changed()
+
+    def unregister(self, name):
+        if self.fragments.pop(name, None):
+            self.changed()
+
+    @property
+    def windows(self):
+        """Classes of windows with registered QSS"""
+        return tuple({
+            fragment.window: None
+            for fragment in self.fragments.values()
+            if fragment.qss
+        })
+
+    def changed(self):
+        config = self.app.config
+        config.extensions.value = {
+            name: {
+                'css': fragment.css,
+                'web_view': fragment.web_view,
+                'screens': fragment.screens,
+                'qss': fragment.qss,
+                'window': fragment.window.__name__ if fragment.window else None
+            }
+            for name, fragment in self.fragments.items()
+        }
+        config.invalidate()
+
+        # the styles are applied when the profile loads or night mode is switched on
+        if self.app.profile_loaded and self.is_on:
+            self.app.refresh_scheduler.request(reload=True)
@@ -0,0 +1,159 @@
+import json
+from os import listdir, makedirs, remove
+from os.path import abspath, dirname, getmtime, isfile, join
+
+from .internals import css
+
+add_on_path = dirname(abspath(__file__))
+
+# produced by build_zip.sh, so fresh installs do not need to build any styles
+DEFAULT_BUNDLE = join(add_on_path, 'bundles', 'default.json')
+
+# paths which differ between machines are substituted when reading and writing
+ARROW_PLACEHOLDER = '{{night_mode_arrow_icon}}'
+
+
+def css_attributes(obj):
+    names = set()
+    for klass in type(obj).__mro__:
+        for name, attribute in vars(klass).items():
+            if isinstance(attribute, css):
+                names.add(name)
+    return sorted(names)
+
+
+class ThemeBundle:
+    """All compiled web CSS fragments and Qt stylesheets for a given state of settings.
+
+    Values of `css` properties are computed on the first use and kept until
+    the style-related settings change. Complete bundles are written into
+    the user files (keyed by the hash of settings), so the next session with
+    the same settings reads all the styles in one call instead of building them.
+    """
+
+    kept_bundles = 5
+
+    def __init__(self, app):
+        self.app = app
+        self.fingerprint = None
+        self.styles = {}
+        self.stored = False
+
+    @property
+    def directory(self):
+        return join(add_on_path, 'user_files', 'bundles')
+
+    def path(self, fingerprint):
+        return join(self.directory, fingerprint + '.json')
+
+    def get(self, key, compute, obj):
+        fingerprint = self.app.config.fingerprint
+
+        if fingerprint != self.fingerprint:
+            self.switch(fingerprint)
+
+        try:
+            return self.styles[key]
+        except KeyError:
+            value = compute(obj)
+            self.styles[key] = value
+            return value
+
+    def switch(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.styles = {}
+        self.stored = False
+
+        for path in [self.path(fingerprint), DEFAULT_BUNDLE]:
+            styles = self.read(path, fingerprint)
+            if styles is not None:
+                self.styles = styles
+                self.stored = True
+                break
+
+    def read(self, path, fingerprint):
+        if not isfile(path):
+            return None
+
+        try:
+            with open(path) as f:
+                bundle = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+        if bundle.get('fingerprint') != fingerprint or bundle.get('addon_version') != self.app.version:
+            return None
+
+        arrow = self.app.icons.arrow
+        return {
+            key: value.replace(ARROW_PLACEHOLDER, arrow)
+            for key, value in bundle['styles'].items()
+        }
+
+    def compiling(self):
+        """Compute all the styles which were not used yet, yielding after each style or styler."""
+        stylers = self.app.styles.stylers
+        styles = [style(self.app) for style in self.app.styles.styles]
+
+        for obj in styles + stylers:
+            for name in css_attributes(obj):
+                getattr(obj, name)
+            yield
+
+    def compile_all(self):
+        for step in self.compiling():
+            pass
+
+    def serialize(self):
+        arrow = self.app.icons.arrow
+        return {
+            'fingerprint': self.fingerprint,
+            'addon_version': self.app.version,
+            'styles': {
+                key: value.replace(arrow, ARROW_PLACEHOLDER)
+                for key, value in self.styles.items()
+            }
+        }
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.serialize(), f, sort_keys=True)
+
+    def store(self):
+        """Write the bundle for the current settings, unless already stored."""
+        for step in self.storing():
+            pass
+
+    def storing(self):
+        """Incremental version of store(), to be run in steps by an executor.
+
+        Stops if the settings change in the meantime.
+        """
+        fingerprint = self.app.config.fingerprint
+
+        if fingerprint != self.fingerprint:
+            self.switch(fingerprint)
+
+        if self.stored:
+            return
+
+        for step in self.compiling():
+            if self.app.config.fingerprint != fingerprint:
+                return
+            yield
+
+        makedirs(self.directory, exist_ok=True)
+        self.write(self.path(fingerprint))
+        self.stored = True
+        self.remove_old_bundles()
+
+    def remove_old_bundles(self):
+        paths = [
+            join(self.directory, name)
+            for name in listdir(self.directory)
+            if name.endswith('.json')
+        ]
+        paths.sort(key=getmtime, reverse=True)
+
+        for path in paths[self.kept_bundles:]:
+            remove(path)
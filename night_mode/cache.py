@@ -0,0 +1,156 @@
+import sqlite3
+from os.path import join
+
+from aqt import mw
+
+from .cards import transform_many, checksum, source_html
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    cid INTEGER NOT NULL,
+    mod INTEGER NOT NULL,
+    side TEXT NOT NULL,
+    theme TEXT NOT NULL,
+    source INTEGER NOT NULL,
+    html TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS cards_key ON cards (cid, mod, side, theme);
+"""
+
+
+class RenderedCardsCache:
+    """Sidecar SQLite store of cards HTML after night mode transformations.
+
+    Entries are keyed by card id, note modification time, side of the card
+    and a hash of the settings; the checksum of the source HTML is stored
+    as well, so changes of templates cannot result in stale cards.
+
+    Reading an entry is a single indexed query; new entries are kept
+    in memory and written in batches by flush() (outside of the review path),
+    which also evicts the oldest entries when the store grows above max_entries.
+    """
+
+    file_name = 'night_mode_cache.db'
+    max_entries = 50000
+    chunk_size = 250
+
+    def __init__(self):
+        self.path = None
+        self.connection = None
+        # key => (source, html) of entries not written yet
+        self.pending = {}
+
+    def open(self, profile_folder):
+        """Use the store of given profile (connected on the first use); called when a profile loads."""
+        path = join(profile_folder, self.file_name)
+
+        if path != self.path:
+            # entries of another profile
+            self.pending = {}
+            self.disconnect()
+            self.path = path
+
+    @property
+    def db(self):
+        if not self.connection:
+            self.connection = sqlite3.connect(self.path)
+            # it is only a cache: losing the last writes on a crash is fine
+            self.connection.execute('PRAGMA journal_mode = WAL')
+            self.connection.execute('PRAGMA synchronous = OFF')
+            self.connection.executescript(SCHEMA)
+
+        return self.connection
+
+    def close(self):
+        self.flush()
+        self.disconnect()
+
+    def disconnect(self):
+        if self.connection:
+            self.connection.close()
+        self.connection = None
+
+    def get(self, key, source):
+        if key in self.pending:
+            row = self.pending[key]
+        else:
+            row = self.db.execute(
+                'SELECT source, html FROM cards WHERE cid = ? AND mod = ? AND side = ? AND theme = ?',
+                key
+            ).fetchone()
+
+        if row and row[0] == source:
+            return row[1]
+
+    def put(self, key, source, html):
+        self.pending[key] = source, html
+
+    def flush(self):
+        if not self.pending:
+            return
+
+        entries = [(key, source, html) for key, (source, html) in self.pending.items()]
+        self.pending = {}
+
+        try:
+            self.put_many(entries)
+        except sqlite3.Error as e:
+            print('Night Mode: could not write the cards cache:', e)
+
+    def put_many(self, entries):
+        with self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO cards (cid, mod, side, theme, source, html) VALUES (?, ?, ?, ?, ?, ?)',
+                [(*key, source, html) for key, source, html in entries]
+            )
+            self.evict()
+
+    def evict(self):
+        # rowids grow monotonically, so the oldest entries have the lowest ones
+        self.db.execute(
+            'DELETE FROM cards WHERE rowid <= (SELECT max(rowid) FROM cards) - ?',
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        self.pending = {}
+        with self.db:
+            self.db.execute('DELETE FROM cards')
+
+    def prefill(self, renderer, deck_id):
+        """Render and store all cards of given deck (including sub-decks).
+
+        Anki renders the cards in the main thread (the collection cannot be
+        shared); the transformations are cheap in comparison, so these are
+        computed in the same process (a pool would fork the GUI process).
+
+        Returns:
+            number of stored sides of cards
+        """
+        card_ids = mw.col.decks.cids(deck_id, children=True)
+        options = renderer.options
+
+        keys = []
+        sources = []
+
+        mw.progress.start(max=len(card_ids), label='Preparing night mode cache')
+        try:
+            for i, card_id in enumerate(card_ids):
+                card = mw.col.getCard(card_id)
+                for side in ['q', 'a']:
+                    keys.append(renderer.key(card, side, options))
+                    sources.append(source_html(card, side))
+                if i % self.chunk_size == 0:
+                    mw.progress.update(value=i)
+
+            transformed = transform_many(sources, options)
+
+            self.put_many(
+                (key, checksum(source), html)
+                for key, source, html in zip(keys, sources, transformed)
+            )
+        finally:
+            mw.progress.finish()
+
+        return len(transformed)
@@ -0,0 +1,116 @@
+from collections import namedtuple
+from zlib import crc32
+
+from .color_rewrites import rewrite_html
+from .css_class import inject_css_class
+from .tasks import BACKGROUND
+
+
+# contexts of the prepareQA hook which are worth caching, mapped to the sides of a card
+SIDES = {
+    'reviewQuestion': 'q',
+    'reviewAnswer': 'a'
+}
+
+
+TransformOptions = namedtuple('TransformOptions', ['state', 'rewrites'])
+
+
+def transform(html, options):
+    """Apply night mode transformations to the HTML of a card.
+
+    The function has to depend only on its arguments, so the results
+    can be computed ahead of time, in other threads or processes.
+    """
+    if options.rewrites:
+        html = rewrite_html(html, options.rewrites, elements=('font',))
+    return inject_css_class(options.state, html)
+
+
+def is_trivial(options):
+    """Does the transformation only prepend a constant script (which is cheaper than any lookup)?"""
+    return not options.rewrites
+
+
+def transform_many(htmls, options):
+    return [transform(html, options) for html in htmls]
+
+
+def checksum(html):
+    return crc32(html.encode('utf-8'))
+
+
+def source_html(card, side):
+    """HTML of a side of the card as passed by the reviewer to prepareQA.
+
+    The type-in answer comparison is not included as it depends on user input.
+    """
+    from aqt import mw
+
+    html = card.q() if side == 'q' else card.a()
+
+    try:
+        from aqt.utils import mungeQA
+        html = mungeQA(mw.col, html)
+    except ImportError:
+        pass
+
+    return html
+
+
+class CardRenderer:
+    """Applies night mode transformations to cards, reusing cached results when possible."""
+
+    def __init__(self, app, cache, prefetcher):
+        self.app = app
+        self.cache = cache
+        self.prefetcher = prefetcher
+
+    @property
+    def options(self):
+        config = self.app.config
+        state = config.state_on.value
+        rewrites = ()
+
+        if state and config.rewrite_colors_in_html.value:
+            rewrites = tuple(sorted(config.user_color_map.value.items()))
+
+        return TransformOptions(state=state, rewrites=rewrites)
+
+    def theme(self, options):
+        return self.app.config.fingerprint + ':' + str(int(options.state))
+
+    def key(self, card, side, options):
+        return card.id, card.note().mod, side, self.theme(options)
+
+    def render(self, html, card, context):
+        options = self.options
+        side = SIDES.get(context)
+        # trivial transformations are cheaper to compute again than to look up
+        trivial = is_trivial(options)
+        use_cache = self.app.config.cache_cards.value and not trivial
+        use_prefetched = self.prefetcher.enabled and not trivial
+
+        if not side or not (use_cache or use_prefetched):
+            return transform(html, options)
+
+        key = self.key(card, side, options)
+        source = checksum(html)
+
+        if use_prefetched:
+            prefetched = self.prefetcher.take(key, source)
+            if prefetched is not None:
+                return prefetched
+
+        if use_cache:
+            cached = self.cache.get(key, source)
+            if cached is not None:
+                return cached
+
+        html = transform(html, options)
+
+        if use_cache:
+            self.cache.put(key, source, html)
+            # written after the card is shown, along with other new entries
+            self.app.executor.submit(self.cache.flush, BACKGROUND, key='cards_cache')
+        return html
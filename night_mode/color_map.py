@@ -117,14 +117,17 @@ class ColorMapping(QWidget):
 
 class ColorMapWindow(AddonDialog):
 
-    def __init__(self, parent, color_map, title='Customise colors swapping', on_update=None):
+    def __init__(
+        self, parent, color_map, title='Customise colors swapping', on_update=None,
+        header='Specify how particular colors on your cards should be swapped when the night mode is on.'
+    ):
         super().__init__(self, parent, Qt.Window)
         self.on_update = on_update
         self.color_map = color_map
 
-        self.init_ui(title)
+        self.init_ui(title, header)
 
-    def init_ui(self, title):
+    def init_ui(self, title, header):
         self.setWindowTitle(_(title))
 
         btn_add_mapping = create_button('+ Add colors mapping', self.on_add)
@@ -139,10 +142,7 @@ class ColorMapWindow(AddonDialog):
         body = QVBoxLayout()
         body.setAlignment(Qt.AlignTop)
 
-        header = QLabel(_(
-            'Specify how particular colors on your cards '
-            'should be swapped when the night mode is on.'
-        ))
+        header = QLabel(_(header))
         header.setAlignment(Qt.AlignCenter)
 
         mappings = QVBoxLayout()
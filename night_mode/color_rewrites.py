@@ -0,0 +1,123 @@
+import re
+from collections import OrderedDict
+from functools import lru_cache
+
+
+# colors used by Anki in the deck browser, overview, card info and so on:
+# old color => (new color, kinds of elements using the old color, should the rule be important?)
+DEFAULT_RULES = {
+    '#007700': ('#00CC00', ('font',), True),
+    '#070': ('#00CC00', ('span',), True),
+    '#000099': ('#00BBFF', ('font',), True),
+    '#00F': ('#00BBFF', ('span',), True),
+    '#00a': ('#00BBFF', ('font',), False),
+    '#C35617': ('#D46728', ('font',), True),
+    '#c00': ('#D46728', ('span',), True)
+}
+
+DEFAULT_REWRITES = {
+    old: new
+    for old, (new, elements, important) in DEFAULT_RULES.items()
+}
+
+SELECTORS = {
+    'font': 'font[color="{color}" i]',
+    'span': 'span[style="color:{color}" i]'
+}
+
+PATTERNS = {
+    'font': r'<font\b[^>]*?\bcolor\s*=\s*["\']?',
+    'span': r'<span\b[^>]*?\bstyle\s*=\s*["\']\s*color\s*:\s*'
+}
+
+
+def normalize(color):
+    return color.strip().lower()
+
+
+# normalized old color => (kinds of elements, importance), for colors from the default table
+DEFAULT_KINDS = {
+    normalize(old): (elements, important)
+    for old, (new, elements, important) in DEFAULT_RULES.items()
+}
+
+
+def compile_css(rewrites, elements=('font', 'span'), scope=None, kinds=None):
+    """Compile a table of colors rewrites into a minimal set of CSS rules.
+
+    Attribute values are matched case-insensitively so spelling variants
+    of a color share a single selector; selectors are grouped by the
+    replacement color (and importance), giving one rule per each new color.
+
+    Args:
+        rewrites: mapping of old colors to new colors
+        elements: which kinds of HTML elements should have colors rewritten
+        scope: selector of an ancestor of the elements (e.g. to raise the specificity of the rules)
+        kinds: mapping of normalized old colors to pairs of: kinds of elements and importance
+            of the rule, overriding the defaults (all the elements, important) for these colors
+    """
+    kinds = kinds or {}
+    groups = OrderedDict()
+    seen = set()
+
+    for old, new in rewrites.items():
+        if not (old and new):
+            continue
+        old = normalize(old)
+        old_elements, important = kinds.get(old, (elements, True))
+        for element in old_elements:
+            selector = SELECTORS[element].format(color=old)
+            if scope:
+                selector = scope + ' ' + selector
+            if selector not in seen:
+                seen.add(selector)
+                groups.setdefault((new, important), []).append(selector)
+
+    return ''.join(
+        f'{",".join(selectors)}{{color:{new}{"!important" if important else ""}}}'
+        for (new, important), selectors in groups.items()
+    )
+
+
+@lru_cache(maxsize=16)
+def compile_regex(rewrites, elements=('font', 'span')):
+    """Compile a table of colors rewrites into a single regular expression.
+
+    Args:
+        rewrites: tuple of (old color, new color) pairs
+        elements: which kinds of HTML elements should have colors rewritten
+
+    Returns:
+        a pair of the pattern and the replacement function or None if there is nothing to rewrite
+    """
+    mapping = {normalize(old): new for old, new in rewrites if old and new}
+
+    if not mapping:
+        return None
+
+    colors = '|'.join(
+        re.escape(color)
+        for color in sorted(mapping, key=len, reverse=True)
+    )
+    prefixes = '|'.join(PATTERNS[element] for element in elements)
+    pattern = re.compile(f'({prefixes})({colors})(?![\\w-])', re.IGNORECASE)
+
+    def replace(match):
+        return match.group(1) + mapping[match.group(2).lower()]
+
+    return pattern, replace
+
+
+def rewrite_html(html, rewrites, elements=('font', 'span')):
+    """Rewrite colors of HTML elements in a single pass.
+
+    Args:
+        rewrites: tuple of (old color, new color) pairs
+    """
+    compiled = compile_regex(rewrites, elements)
+
+    if not compiled:
+        return html
+
+    pattern, replace = compiled
+    return pattern.sub(replace, html)
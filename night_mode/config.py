@@ -1,5 +1,57 @@
+import json
+from copy import deepcopy
+from hashlib import sha1
+
 from aqt import mw
-from .internals import Setting
+from .internals import Setting, resolution_order, singleton_for
+
+
+SCHEMA_VERSION = 1
+
+
+def drop_state_on(values):
+    """The state is determined programmatically after start-up, it does not need to be stored."""
+    values.pop('state_on', None)
+
+
+# version => function converting stored values from the previous version
+MIGRATIONS = {
+    1: drop_state_on
+}
+
+
+def conform(value, default, arbitrary_keys=False):
+    """Check a value (e.g. imported from a theme) against the default value of a setting.
+
+    Returns:
+        the value; keys missing from dicts with fixed keys are taken from the default
+
+    Raises:
+        ValueError: if the type or the shape of the value differs from the default
+    """
+    # JSON has no sets
+    if isinstance(default, set) and isinstance(value, list):
+        value = set(value)
+
+    if type(value) is not type(default):
+        raise ValueError(f'expected {type(default).__name__}, got {type(value).__name__}')
+
+    if isinstance(default, dict) and not arbitrary_keys:
+        value = dict(value)
+        for key, default_item in default.items():
+            if key in value:
+                value[key] = conform(value[key], default_item)
+            else:
+                value[key] = deepcopy(default_item)
+
+    return value
+
+
+def migrate(values, version):
+    values = dict(values)
+    for target_version in range(version + 1, SCHEMA_VERSION + 1):
+        MIGRATIONS[target_version](values)
+    return values
 
 
 class Config:
@@ -8,41 +60,167 @@ class Config:
         self.app = app
         self.prefix = prefix
         self.settings = {}
+        self._fingerprint = None
+        # name => copy of value of setting as it was last loaded or saved
+        self.saved = {}
+        self.stored_version = SCHEMA_VERSION
 
     # has to be separately from __init__ to avoid circular reference
     def init_settings(self):
-        for setting_class in Setting.members:
-            setting = setting_class(self.app)
+        for setting_class in resolution_order(Setting.members):
+            setting = singleton_for(setting_class, self.app)
             self.settings[setting.name] = setting
 
     def __getattr__(self, attr):
         return self.settings[attr]
 
+    @property
+    def persistent_settings(self):
+        return {
+            name: setting
+            for name, setting in self.settings.items()
+            if setting.persistent
+        }
+
+    def snapshot(self, only_style=False):
+        return {
+            name: setting.value
+            for name, setting in self.settings.items()
+            if setting.affects_style or not only_style
+        }
+
+    @property
+    def fingerprint(self):
+        """Hash of the settings which influence generated styles.
+
+        It is memoized until the next call of invalidate(),
+        so it is cheap enough to be used on the review path.
+        """
+        if self._fingerprint is None:
+            serialized = json.dumps(self.snapshot(only_style=True), sort_keys=True, default=sorted)
+            self._fingerprint = sha1(serialized.encode()).hexdigest()
+        return self._fingerprint
+
+    def invalidate(self):
+        self._fingerprint = None
+
+    @property
+    def dirty(self):
+        """Names of settings changed since the last load or save"""
+        return [
+            name
+            for name, setting in self.persistent_settings.items()
+            if name not in self.saved or self.saved[name] != setting.value
+        ]
+
     def stored_name(self, name):
         return self.prefix + name
 
+    @property
+    def version_key(self):
+        return self.stored_name('schema_version')
+
     def load(self):
-        for name, setting in self.settings.items():
-            key = self.stored_name(name)
-            value = mw.pm.profile.get(key, setting.default_value)
+        profile = mw.pm.profile
 
-            setting.value = value
+        stored = {
+            name: profile[self.stored_name(name)]
+            for name in self.settings
+            if self.stored_name(name) in profile
+        }
+        self.stored_version = profile.get(self.version_key, 0)
+        stored = migrate(stored, self.stored_version)
+
+        for name, setting in self.persistent_settings.items():
+            # a copy, so changes are not propagated to the profile until saved
+            setting.value = deepcopy(stored.get(name, setting.default_value))
+
+        self.saved = {
+            name: deepcopy(value)
+            for name, value in stored.items()
+        }
+
+        self.invalidate()
 
         for setting in self.settings.values():
             setting.on_load()
 
     def save(self):
         """
-        Saves configurable variables into profile, so they can
+        Saves changed variables into profile, so they can
         be used to restore previous state after Anki restart.
         """
-        for name, setting in self.settings.items():
-            key = self.stored_name(name)
-            mw.pm.profile[key] = setting.value
+        profile = mw.pm.profile
+
+        for name in self.dirty:
+            value = self.settings[name].value
+            profile[self.stored_name(name)] = deepcopy(value)
+            self.saved[name] = deepcopy(value)
+
+        if self.stored_version != SCHEMA_VERSION:
+            for name, setting in self.settings.items():
+                if not setting.persistent:
+                    profile.pop(self.stored_name(name), None)
+            profile[self.version_key] = SCHEMA_VERSION
+            self.stored_version = SCHEMA_VERSION
 
         for setting in self.settings.values():
             setting.on_save()
 
+    def export_theme(self, path):
+        """Write all persistent settings into a JSON file."""
+        theme = {
+            'schema_version': SCHEMA_VERSION,
+            'addon_version': self.app.version,
+            'settings': {
+                name: setting.value
+                for name, setting in self.persistent_settings.items()
+            }
+        }
+        with open(path, 'w') as f:
+            json.dump(theme, f, indent=4, sort_keys=True, default=sorted)
+
+    def import_theme(self, path):
+        """Read settings from a JSON file created by export_theme().
+
+        Returns:
+            names of imported settings
+        """
+        with open(path) as f:
+            theme = json.load(f)
+
+        if not isinstance(theme, dict) or not isinstance(theme.get('settings'), dict):
+            raise ValueError('The file is not a Night Mode theme')
+
+        version = theme.get('schema_version', 0)
+
+        if version > SCHEMA_VERSION:
+            raise ValueError('The theme was created by a newer version of Night Mode')
+
+        values = migrate(theme['settings'], version)
+        settings = self.persistent_settings
+        conformed = {}
+
+        # all values are checked first, so an invalid theme is not imported partially
+        for name, value in values.items():
+            setting = settings.get(name)
+            if not setting:
+                continue
+            try:
+                conformed[name] = conform(value, setting.default_value, setting.arbitrary_keys)
+            except ValueError as e:
+                raise ValueError(f'Invalid value of {name}: {e}')
+
+        for name, value in conformed.items():
+            setting = settings[name]
+            setting.value = value
+            setting.on_import()
+
+        imported = list(conformed)
+
+        self.invalidate()
+        return imported
+
 
 class ConfigValueGetter:
 
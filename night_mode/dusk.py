@@ -0,0 +1,136 @@
+import json
+
+from PyQt5.QtWebEngineWidgets import QWebEngineScript
+
+from .scripts import WEB_VIEWS
+
+
+class DuskLadder:
+    """Dims the screens of the main window gradually before the automatic night mode starts.
+
+    The brightness of each step is precomputed (when the schedule changes)
+    and applied by setting a CSS custom property on the open pages, so no
+    styles are recompiled and no web view is reloaded during the dusk.
+    A script (replaced on each step) sets the property on new documents.
+    """
+
+    name = 'night_mode_dusk'
+    property_name = '--night-mode-dusk'
+    # brightness of the last step, just before the night mode starts
+    darkest = 0.6
+
+    # run on creation of new documents, and on the open ones on each step
+    source = """
+    (function()
+    {
+        function apply()
+        {
+            var root = document.documentElement
+            if(!root)
+                return false
+
+            root.style.setProperty('%(property)s', %(brightness)s)
+
+            if(!document.getElementById('night-mode-dusk'))
+            {
+                var style = document.createElement('style')
+                style.id = 'night-mode-dusk'
+                style.textContent = 'html{filter:brightness(var(%(property)s, 1))}'
+                root.appendChild(style)
+            }
+            return true
+        }
+
+        // the document element does not exist yet when the document is created
+        if(!apply())
+        {
+            new MutationObserver(function(mutations, observer)
+            {
+                if(apply())
+                    observer.disconnect()
+            }).observe(document, {childList: true})
+        }
+    })()
+    """
+
+    remove = """
+    (function()
+    {
+        var style = document.getElementById('night-mode-dusk')
+        if(style)
+            style.parentNode.removeChild(style)
+        document.documentElement.style.removeProperty('%(property)s')
+    })()
+    """
+
+    def __init__(self):
+        self.steps = 0
+        self.levels = []
+        self.sources = []
+        # step currently applied (0 when not dimmed, None when the levels changed since)
+        self.step = 0
+
+    def prepare(self, steps):
+        """Precompute the brightness of each step of the dusk (and the scripts applying it)."""
+        if steps == self.steps:
+            return
+
+        self.steps = steps
+        if self.step:
+            # the same step has a different brightness now, it needs to be applied again
+            self.step = None
+        self.levels = [
+            round(1 - (1 - self.darkest) * step / steps, 3)
+            for step in range(1, steps + 1)
+        ]
+        self.sources = [
+            self.source % {'property': self.property_name, 'brightness': json.dumps(level)}
+            for level in self.levels
+        ]
+
+    @staticmethod
+    def web_views():
+        from aqt import mw
+        return [getattr(mw, web_view) for web_view in WEB_VIEWS]
+
+    def apply(self, step):
+        """Switch to given step (1 to the number of steps)"""
+        if step == self.step:
+            return
+
+        index = step - 1
+
+        for web in self.web_views():
+            source = self.sources[index]
+            self.install_script(web, source)
+            web.page().runJavaScript(source)
+
+        self.step = step
+
+    def install_script(self, web, source):
+        scripts = web.page().scripts()
+
+        script = scripts.findScript(self.name)
+        if not script.isNull():
+            scripts.remove(script)
+
+        script = QWebEngineScript()
+        script.setName(self.name)
+        script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+        script.setWorldId(QWebEngineScript.MainWorld)
+        script.setRunsOnSubFrames(False)
+        script.setSourceCode(source)
+        scripts.insert(script)
+
+    def clear(self):
+        if self.step == 0:
+            return
+
+        for web in self.web_views():
+            scripts = web.page().scripts()
+            script = scripts.findScript(self.name)
+            if not script.isNull():
+                scripts.remove(script)
+            web.page().runJavaScript(self.remove % {'property': self.property_name})
+
+        self.step = 0
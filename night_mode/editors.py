@@ -0,0 +1,177 @@
+import json
+from weakref import WeakKeyDictionary
+
+
+class BackgroundWorkaround:
+    """Removes white backgrounds which Chrome adds to text when deleting or pasting in the editor.
+
+    The script is installed once per editor web view; afterwards a
+    MutationObserver inspects only the nodes which changed, removing the
+    style of the offending span and strong elements in place (so neither
+    the caret position nor the undo history are lost).
+    Only changes inside of the fields are inspected, so loading a note
+    does not modify its content.
+    """
+
+    install_script = """
+    (function install_background_workaround()
+    {
+        if(window.nightModeBackgroundWorkaround)
+            return
+
+        var white = 'background-color: rgb(255, 255, 255);'
+        var selector = 'span[style="' + white + '"], strong[style="' + white + '"]'
+
+        function is_in_field(node)
+        {
+            return node && node.closest && node.closest('.field') !== null
+        }
+
+        function get_rid_of_background(element)
+        {
+            if(element.matches(selector))
+                element.removeAttribute('style')
+
+            var nested = element.querySelectorAll(selector)
+            for(var i = 0; i < nested.length; i++)
+                nested[i].removeAttribute('style')
+        }
+
+        function on_mutations(mutations)
+        {
+            for(var i = 0; i < mutations.length; i++)
+            {
+                var mutation = mutations[i]
+
+                if(!is_in_field(mutation.target))
+                    continue
+
+                if(mutation.type === 'attributes')
+                {
+                    if(mutation.target.matches(selector))
+                        mutation.target.removeAttribute('style')
+                    continue
+                }
+
+                var added = mutation.addedNodes
+                for(var j = 0; j < added.length; j++)
+                {
+                    if(added[j].nodeType === Node.ELEMENT_NODE)
+                        get_rid_of_background(added[j])
+                }
+            }
+        }
+
+        var observer = new MutationObserver(on_mutations)
+
+        window.nightModeBackgroundWorkaround = {
+            enable: function()
+            {
+                observer.observe(document.body, {
+                    childList: true,
+                    subtree: true,
+                    attributes: true,
+                    attributeFilter: ['style']
+                })
+            },
+            disable: function()
+            {
+                observer.disconnect()
+            }
+        }
+    })()
+    """
+
+    def __init__(self):
+        # editor web view => is the workaround enabled?
+        self.enabled = WeakKeyDictionary()
+
+    def update(self, editor, state):
+        web = editor.web
+
+        if self.enabled.get(web, False) == state:
+            return
+
+        javascript = ''
+
+        if web not in self.enabled:
+            javascript = self.install_script
+
+        action = 'enable' if state else 'disable'
+        javascript += f'window.nightModeBackgroundWorkaround.{action}()'
+
+        web.eval(javascript)
+        self.enabled[web] = state
+
+    def disable_all(self):
+        for web, enabled in list(self.enabled.items()):
+            if not enabled:
+                continue
+            try:
+                web.eval('window.nightModeBackgroundWorkaround.disable()')
+            except RuntimeError:
+                # the web view was already deleted
+                pass
+            self.enabled[web] = False
+
+
+class EditorStyles:
+    """Keeps the night mode CSS of all live editors up to date.
+
+    The CSS lives in a single style element with a known id, so a change
+    of settings replaces its content (with one eval per editor) instead of
+    requiring a restart or reloading of the note.
+    """
+
+    element_id = 'night-mode-editor-style'
+
+    update_script = """
+    (function update_night_mode_style(css)
+    {
+        var style = document.getElementById('%(id)s')
+        if(!style)
+        {
+            style = document.createElement('style')
+            style.id = '%(id)s'
+            // after the styles of Anki
+            document.body.appendChild(style)
+        }
+        style.textContent = css
+    })(%(css)s)
+    """
+
+    def __init__(self):
+        # editor web view => CSS currently present in the page
+        self.applied = WeakKeyDictionary()
+
+    def style_element(self, css):
+        return f'<style id="{self.element_id}">{css}</style>'
+
+    def register(self, editor, css):
+        """Start tracking the editor, updating its style if needed."""
+        web = editor.web
+        if web not in self.applied:
+            # the page was created with the styles appended to its HTML
+            self.applied[web] = css
+        self.update(web, css)
+
+    def track(self, web_views):
+        """Start tracking web views of editors created without the night mode styles."""
+        for web in web_views:
+            if web not in self.applied:
+                self.applied[web] = ''
+
+    def update(self, web, css):
+        if self.applied.get(web) == css:
+            return
+
+        web.eval(self.update_script % {'id': self.element_id, 'css': json.dumps(css)})
+        self.applied[web] = css
+
+    def update_all(self, css):
+        for web in list(self.applied.keys()):
+            try:
+                self.update(web, css)
+            except RuntimeError:
+                # the web view was already deleted
+                del self.applied[web]
@@ -0,0 +1,228 @@
+from PyQt5.QtCore import Qt, QRect, QRectF
+from PyQt5.QtGui import QBrush, QColor, QLinearGradient, QPainter, QPalette
+from PyQt5.QtWidgets import QApplication, QProxyStyle, QStyle, QStyleFactory
+
+from .styles import ButtonsStyle
+
+
+class ApplicationStyleSheet:
+    """Styles all the dialogs with a single style sheet set on the application.
+
+    Setting a style sheet on every widget of a newly opened window makes Qt
+    parse and polish each of them separately; with the application style
+    sheet the rules (scoped to the windows by their class names) are parsed
+    once, when night mode is switched on, and the windows open without
+    any additional styling work.
+    """
+
+    def __init__(self, stylers):
+        self.stylers = stylers
+        self.original = None
+
+    @staticmethod
+    def compile(stylers):
+        # most of the stylers do not style dialogs
+        return ''.join(
+            getattr(styler, 'application_qss', '')
+            for styler in stylers
+        )
+
+    def apply(self):
+        app = QApplication.instance()
+
+        if self.original is None:
+            self.original = app.styleSheet()
+
+        app.setStyleSheet(self.original + self.compile(self.stylers()))
+
+    def restore(self):
+        if self.original is None:
+            return
+
+        QApplication.instance().setStyleSheet(self.original)
+        self.original = None
+
+
+# the same gradients as in ButtonsStyle.advanced_qt: (position, color) stops
+BUTTON_GRADIENTS = {
+    'idle': [(0.03, '#3D4850'), (0.04, '#313d45'), (1, '#232B30')],
+    'hover': [(0.03, '#4C5A64'), (0.04, '#404F5A'), (1, '#2E3940')],
+    'pressed': [(0.03, '#20282D'), (0.51, '#252E34'), (1, '#222A30')]
+}
+
+BUTTON_BORDER = '#3E474D'
+
+
+class DarkProxyStyle(QProxyStyle):
+    """Draws the buttons and the scroll bars of the night theme, delegating everything else to the base style."""
+
+    def __init__(self, base_style, scroll_bars=True):
+        super().__init__(base_style)
+        self.scroll_bars = scroll_bars
+
+    @staticmethod
+    def button_state(option):
+        if not option.state & QStyle.State_Enabled or option.state & QStyle.State_Sunken:
+            return 'pressed'
+        if option.state & QStyle.State_MouseOver:
+            return 'hover'
+        return 'idle'
+
+    def draw_button(self, option, painter):
+        rect = QRectF(option.rect).adjusted(0.5, 0.5, -0.5, -0.5)
+
+        gradient = QLinearGradient(rect.topLeft(), rect.bottomLeft())
+        for position, color in BUTTON_GRADIENTS[self.button_state(option)]:
+            gradient.setColorAt(position, QColor(color))
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QColor(BUTTON_BORDER))
+        painter.setBrush(QBrush(gradient))
+        painter.drawRoundedRect(rect, 3, 3)
+        painter.restore()
+
+    def drawPrimitive(self, element, option, painter, widget=None):
+        if element in (QStyle.PE_PanelButtonCommand, QStyle.PE_PanelButtonBevel):
+            self.draw_button(option, painter)
+            return
+        super().drawPrimitive(element, option, painter, widget)
+
+    def draw_scroll_bar(self, option, painter, widget):
+        painter.save()
+        painter.fillRect(option.rect, QColor(ButtonsStyle.scrollbar_background))
+
+        handle = self.subControlRect(QStyle.CC_ScrollBar, option, QStyle.SC_ScrollBarSlider, widget)
+        handle = QRectF(handle).adjusted(4, 4, -4, -4)
+
+        if handle.isValid():
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(ButtonsStyle.scrollbar_color))
+            painter.drawRoundedRect(handle, 3, 3)
+
+        painter.restore()
+
+    def drawComplexControl(self, control, option, painter, widget=None):
+        if control == QStyle.CC_ScrollBar and self.scroll_bars:
+            self.draw_scroll_bar(option, painter, widget)
+            return
+        super().drawComplexControl(control, option, painter, widget)
+
+    def subControlRect(self, control, option, sub_control, widget=None):
+        if control == QStyle.CC_ScrollBar and self.scroll_bars:
+            # no arrow buttons, as with the style sheet
+            if sub_control in (QStyle.SC_ScrollBarAddLine, QStyle.SC_ScrollBarSubLine):
+                return QRect()
+            if sub_control == QStyle.SC_ScrollBarGroove:
+                return option.rect
+            if sub_control == QStyle.SC_ScrollBarSlider:
+                return self.slider_rect(option)
+        return super().subControlRect(control, option, sub_control, widget)
+
+    @staticmethod
+    def slider_rect(option):
+        rect = option.rect
+        horizontal = option.orientation == Qt.Horizontal
+        length = rect.width() if horizontal else rect.height()
+
+        span = option.maximum - option.minimum
+        # the same minimal size as in ButtonsStyle.qt_scrollbars (20px) plus margins
+        slider_length = length if span <= 0 else max(length * option.pageStep // (span + option.pageStep), 28)
+        slider_length = min(slider_length, length)
+
+        start = QStyle.sliderPositionFromValue(
+            option.minimum, option.maximum, option.sliderPosition,
+            length - slider_length, option.upsideDown
+        )
+
+        if horizontal:
+            return QRect(rect.x() + start, rect.y(), slider_length, rect.height())
+        return QRect(rect.x(), rect.y() + start, rect.width(), slider_length)
+
+    def pixelMetric(self, metric, option=None, widget=None):
+        if metric == QStyle.PM_ScrollBarExtent and self.scroll_bars:
+            return ButtonsStyle.scrollbar_size
+        return super().pixelMetric(metric, option, widget)
+
+
+class NativeStyle:
+    """Styles the dialogs with a dark palette and a proxy style, without any style sheets.
+
+    Widgets styled with style sheets are laid out and painted by Qt's
+    style sheet style, which is considerably slower than the native styles;
+    this engine expresses the flat colors of the theme with a palette,
+    and draws the button gradients and the scroll bars in a proxy style.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.original_palette = None
+        self.original_style = None
+        # the proxy style installed by apply()
+        self.style = None
+
+    def palette(self):
+        config = self.app.config
+        palette = QPalette()
+
+        colors = {
+            QPalette.Window: config.color_b.value,
+            QPalette.WindowText: config.color_t.value,
+            QPalette.Base: config.color_s.value,
+            QPalette.AlternateBase: config.color_b.value,
+            QPalette.Text: config.color_t.value,
+            QPalette.Button: '#313d45',
+            QPalette.ButtonText: '#AFB9C1',
+            QPalette.BrightText: '#fff',
+            QPalette.Highlight: config.color_a.value,
+            QPalette.HighlightedText: '#fff',
+            QPalette.ToolTipBase: '#444',
+            QPalette.ToolTipText: '#eee',
+            QPalette.Light: '#4C5A64',
+            QPalette.Midlight: '#3D4850',
+            QPalette.Mid: '#2d363c',
+            QPalette.Dark: '#1c252b',
+            QPalette.Shadow: '#111'
+        }
+
+        for role, color in colors.items():
+            palette.setColor(role, QColor(color))
+
+        for role in [QPalette.WindowText, QPalette.Text, QPalette.ButtonText]:
+            palette.setColor(QPalette.Disabled, role, QColor('#777'))
+
+        return palette
+
+    def apply(self):
+        app = QApplication.instance()
+
+        if self.original_style is None:
+            self.original_palette = QPalette(app.palette())
+            self.original_style = app.style().objectName()
+
+        # setting a style or a palette polishes all the widgets again,
+        # so these are kept on refresh unless the settings changed
+        scroll_bars = self.app.config.style_scroll_bars.value
+
+        if app.style() is not self.style or self.style.scroll_bars != scroll_bars:
+            base_style = QStyleFactory.create(self.original_style)
+            self.style = DarkProxyStyle(base_style, scroll_bars=scroll_bars)
+            app.setStyle(self.style)
+
+        palette = self.palette()
+
+        if app.palette() != palette:
+            app.setPalette(palette)
+
+    def restore(self):
+        if self.original_style is None:
+            return
+
+        app = QApplication.instance()
+        app.setStyle(self.original_style)
+        app.setPalette(self.original_palette)
+
+        self.original_style = None
+        self.original_palette = None
+        self.style = None
@@ -1,4 +1,5 @@
 import re
+from copy import deepcopy
 from PyQt5 import QtCore
 from abc import abstractmethod, ABCMeta
 from inspect import isclass
@@ -31,8 +32,43 @@ class PropertyDescriptor:
 
 
 class css(PropertyDescriptor):
+    """Fragment of CSS (or QSS), kept in the theme bundle of the app.
+
+    The value is reused for as long as the fingerprint of the configuration
+    does not change, so it may depend only on the settings included in it.
+    """
     is_css = True
 
+    def __init__(self, value=None):
+        super().__init__(value)
+        # class => key of the value in the bundle
+        self.keys = {}
+
+    def __get__(self, obj, obj_type):
+        if obj is None:
+            return self
+
+        bundle = getattr(obj.app, 'theme_bundle', None)
+
+        if bundle is None:
+            return self.value(obj)
+
+        klass = type(obj)
+        key = self.keys.get(klass) or self.key(klass)
+        return bundle.get(key, self.value, obj)
+
+    def key(self, klass):
+        """Unique across the modules; the name of the add-on package is skipped
+
+        as it differs between installations (and bundles are shipped prebuilt).
+        """
+        module = klass.__module__
+        if module.startswith(__package__ + '.'):
+            module = module[len(__package__) + 1:]
+
+        key = self.keys[klass] = module + '.' + klass.__qualname__ + '.' + self.value.__name__
+        return key
+
 
 def abstract_property(func):
     return property(abstractmethod(func))
@@ -43,28 +79,73 @@ def snake_case(camel_case):
 
 
 class AbstractRegisteringType(ABCMeta):
+    """Registers the final (leaf) classes in `members` of the root class.
+
+    Members are kept in order of definition (dict is used as an ordered set).
+    Names of classes (unless given explicitly) and the classes they `require`
+    are computed once, when the class is created.
+    """
 
     def __init__(cls, name, bases, attributes):
         super().__init__(name, bases, attributes)
 
         if not hasattr(cls, 'members'):
-            cls.members = set()
+            cls.members = {}
+
+        cls.members[cls] = None
+        for base in bases:
+            cls.members.pop(base, None)
+
+        if 'name' not in attributes and hasattr(cls, 'make_name'):
+            cls.name = cls.make_name()
+
+        # name => required class, sorted by names, so the order does not depend on hashes of classes
+        cls.requirements = {
+            requirement.name: requirement
+            for requirement in sorted(getattr(cls, 'require', ()), key=lambda requirement: requirement.name)
+        }
+
+
+def resolution_order(classes):
+    """Order classes so that each comes after the classes it requires (directly or not).
+
+    Apart from that, the given order is kept, so the result is deterministic.
+    Only the given classes are returned.
+
+    Raises:
+        ValueError: on circular dependencies
+    """
+    ordered = []
+    visiting = set()
+    visited = set()
+
+    def visit(cls):
+        if cls in visited:
+            return
+        if cls in visiting:
+            raise ValueError(f'Circular dependency of {cls.__name__}')
 
-        cls.members.add(cls)
-        cls.members -= set(bases)
+        visiting.add(cls)
+        for requirement in cls.requirements.values():
+            visit(requirement)
+        visiting.remove(cls)
+
+        visited.add(cls)
+        ordered.append(cls)
+
+    for cls in classes:
+        visit(cls)
+
+    classes = set(classes)
+    return [cls for cls in ordered if cls in classes]
 
 
 class SnakeNameMixin:
 
-    @property
-    def name(self):
+    @classmethod
+    def make_name(cls):
         """Nice looking internal identifier."""
-
-        return snake_case(
-            self.__class__.__name__
-            if hasattr(self, '__class__')
-            else self.__name__
-        )
+        return snake_case(cls.__name__)
 
 
 class MenuAction(SnakeNameMixin, metaclass=AbstractRegisteringType):
@@ -116,6 +197,21 @@ def singleton_creator(old_creator):
     return one_to_rule_them_all
 
 
+def singleton_for(cls, app):
+    """The instance of a singleton class, bound to given app.
+
+    An existing instance is reused as it is: calling the class would
+    run its __init__ again, resetting the state of the instance.
+    """
+    instance = cls.instance
+
+    if instance is None:
+        return cls(app)
+
+    instance.app = app
+    return instance
+
+
 class SingletonMetaclass(AbstractRegisteringType):
 
     def __init__(cls, name, bases, attributes):
@@ -128,26 +224,46 @@ class SingletonMetaclass(AbstractRegisteringType):
 
 
 class RequiringMixin:
+    """Injects instances of the required singletons, as attributes named after them.
+
+    An instance is looked up (or created) on the first access
+    to the attribute and kept by the requiring object.
+    """
 
     require = set()
-    dependencies = {}
 
     def __init__(self, app):
-        for requirement in self.require:
-            instance = requirement(app)
-            key = instance.name
-            self.dependencies[key] = instance
+        self.app = app
 
     def __getattr__(self, attr):
-        if attr in self.dependencies:
-            return self.dependencies[attr]
+        requirement = type(self).requirements.get(attr)
+
+        if requirement is None:
+            raise AttributeError(f'{type(self).__name__} has no attribute {attr}')
+
+        instance = requirement.instance
+
+        if instance is None or getattr(instance, 'app', None) is not self.app:
+            instance = singleton_for(requirement, self.app)
+
+        self.__dict__[attr] = instance
+        return instance
 
 
 class Setting(RequiringMixin, SnakeNameMixin, metaclass=SingletonMetaclass):
 
+    # should changes of the setting invalidate generated styles?
+    affects_style = False
+    # should the setting be stored in the profile and exported with themes?
+    persistent = True
+    # are the keys of a dict value arbitrary (e.g. colors of a map), rather than fixed fields?
+    arbitrary_keys = False
+
     def __init__(self, app):
         RequiringMixin.__init__(self, app)
-        self.default_value = self.value
+        self.default_value = deepcopy(self.class_value())
+        # a private copy, so mutations do not leak into the class and the default
+        self.value = deepcopy(self.default_value)
         self.app = app
 
     @abstract_property
@@ -155,6 +271,16 @@ class Setting(RequiringMixin, SnakeNameMixin, metaclass=SingletonMetaclass):
         """Default value of a setting"""
         pass
 
+    def class_value(self):
+        """The default as declared by the class, regardless of the current value of the instance."""
+        for klass in type(self).__mro__:
+            if 'value' in vars(klass):
+                value = vars(klass)['value']
+                # computed by a property, there is no declared default
+                if isinstance(value, property):
+                    return self.value
+                return value
+
     def on_load(self):
         """Callback called after loading of initial value"""
         pass
@@ -162,9 +288,13 @@ class Setting(RequiringMixin, SnakeNameMixin, metaclass=SingletonMetaclass):
     def on_save(self):
         pass
 
+    def on_import(self):
+        """Callback called after the value was replaced by an imported one"""
+        pass
+
     def reset(self):
         if hasattr(self, 'default_value'):
-            self.value = self.default_value
+            self.value = deepcopy(self.default_value)
 
 
 def decorate_or_call(operator):
@@ -207,6 +337,9 @@ class StylerMetaclass(AbstractRegisteringType):
         old_creator = cls.__new__
         cls.__new__ = singleton_creator(old_creator)
 
+        if 'friendly_name' not in attributes:
+            cls.friendly_name = cls.name.replace('_styler', '').replace('_', ' ').title()
+
         # additions and replacements
         cls.additions = {}
         cls.replacements = {}
@@ -0,0 +1,102 @@
+import re
+from collections import namedtuple
+
+from anki.utils import intTime
+
+# the same semantics as the regex previously used by the editor workaround
+WHITE_BACKGROUND = re.compile(r'<(span|strong) style="background-color: rgb\(255, 255, 255\);">(.*?)</(span|strong)>')
+
+# cheap pre-selection of candidate notes, evaluated by SQLite
+CANDIDATES = '%background-color: rgb(255, 255, 255);%'
+
+FIELDS_SEPARATOR = '\x1f'
+
+
+CleanupReport = namedtuple('CleanupReport', ['candidates', 'notes', 'elements'])
+
+
+def remove_white_backgrounds(fields):
+    """Remove white backgrounds from joined fields of a note.
+
+    Every field is processed separately, so matches never cross fields.
+
+    Returns:
+        new fields and number of removed backgrounds
+    """
+    removed = 0
+    cleaned = []
+
+    for field in fields.split(FIELDS_SEPARATOR):
+        field, count = WHITE_BACKGROUND.subn(r'<\1>\2</\1>', field)
+        removed += count
+        cleaned.append(field)
+
+    return FIELDS_SEPARATOR.join(cleaned), removed
+
+
+class WhiteBackgroundsCleaner:
+    """Removes white backgrounds (left by editing in night mode) from all notes of a collection.
+
+    Notes are streamed from the database in batches (ordered by id,
+    continuing after the last seen id) so the memory use does not
+    depend on the size of the collection; every batch of changes
+    is written in a separate transaction.
+    """
+
+    batch_size = 1000
+
+    def __init__(self, collection, progress=None):
+        self.col = collection
+        self.progress = progress
+
+    def count_candidates(self):
+        return self.col.db.scalar('SELECT count() FROM notes WHERE flds LIKE ?', CANDIDATES)
+
+    def batches(self):
+        last_id = 0
+        while True:
+            rows = self.col.db.all(
+                'SELECT id, flds FROM notes WHERE id > ? AND flds LIKE ? ORDER BY id LIMIT ?',
+                last_id, CANDIDATES, self.batch_size
+            )
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def run(self, dry_run=True):
+        total = self.count_candidates()
+        scanned = notes = elements = 0
+
+        if self.progress:
+            self.progress.start(max=total, label='Looking for white backgrounds')
+
+        try:
+            for rows in self.batches():
+                updates = []
+                modified = intTime()
+                usn = self.col.usn()
+
+                for note_id, fields in rows:
+                    fields, removed = remove_white_backgrounds(fields)
+                    if removed:
+                        notes += 1
+                        elements += removed
+                        updates.append((fields, modified, usn, note_id))
+
+                if updates and not dry_run:
+                    self.col.db.executemany('UPDATE notes SET flds = ?, mod = ?, usn = ? WHERE id = ?', updates)
+                    self.col.db.commit()
+
+                scanned += len(rows)
+                if self.progress:
+                    self.progress.update(value=scanned)
+        finally:
+            if self.progress:
+                self.progress.finish()
+
+        if notes and not dry_run:
+            self.col.setMod()
+            self.col.save()
+
+        return CleanupReport(candidates=scanned, notes=notes, elements=elements)
@@ -1,5 +1,5 @@
 from PyQt5.QtCore import Qt, pyqtSlot as slot, QTime
-from PyQt5.QtWidgets import QWidget, QLabel, QGridLayout, QHBoxLayout, QVBoxLayout, QTimeEdit
+from PyQt5.QtWidgets import QWidget, QLabel, QGridLayout, QHBoxLayout, QVBoxLayout, QTimeEdit, QSpinBox
 
 from .gui import create_button, AddonDialog, iterate_widgets
 
@@ -41,6 +41,27 @@ class TimeEdit(QWidget):
         pass
 
 
+class DuskEdit(QWidget):
+
+    def __init__(self, parent, minutes, label, on_update=lambda x: x):
+        QWidget.__init__(self, parent)
+        self.on_update = on_update
+        self.label = QLabel(label)
+        self.spin_box = QSpinBox()
+        self.spin_box.setRange(0, 180)
+        self.spin_box.setSuffix(' min')
+        self.spin_box.setValue(minutes)
+        self.spin_box.valueChanged.connect(self.update)
+        self.grid = QGridLayout()
+        self.grid.addWidget(self.label, 0, 0)
+        self.grid.addWidget(self.spin_box, 1, 0)
+        self.setLayout(self.grid)
+
+    @slot()
+    def update(self):
+        self.on_update(self.spin_box.value())
+
+
 class ModeWindow(AddonDialog):
 
     def __init__(self, parent, settings, title='Manage Night Mode', on_update=lambda x: x):
@@ -84,8 +105,10 @@ class ModeWindow(AddonDialog):
 
         start_at = TimeEdit(self, self.settings['start_at'], 'From', self.start_update)
         end_at = TimeEdit(self, self.settings['end_at'], 'To', self.end_update)
+        dusk = DuskEdit(self, self.settings.get('dusk_minutes', 0), 'Dim gradually before', self.dusk_update)
         time_controls.addWidget(start_at)
         time_controls.addWidget(end_at)
+        time_controls.addWidget(dusk)
 
         self.time_controls = time_controls
 
@@ -108,6 +131,10 @@ class ModeWindow(AddonDialog):
     def end_update(self, time):
         self.set_time('end_at', time)
 
+    def dusk_update(self, minutes):
+        self.settings['dusk_minutes'] = minutes
+        self.on_update()
+
     def set_time(self, which, time):
         self.settings[which] = time
         self.on_update()
@@ -39,20 +39,36 @@ And translators:
 """
 import traceback
 
-from anki.hooks import addHook, runHook
+from anki.hooks import addHook, remHook, runHook
 from aqt import appVersion
 from aqt import mw
+from aqt.editor import EditorWebView
 
 from PyQt5.QtWidgets import QMessageBox
 
 from .actions_and_settings import *
-from .internals import alert
+from .bundles import ThemeBundle
+from .cache import RenderedCardsCache
+from .cards import CardRenderer
+from .internals import alert, resolution_order
+from .notetypes import NoteTypesAnalyzer
+from .prefetch import Prefetcher
+from .profiling import Profiler
+from .refresh import RefreshScheduler
+from .api import NightModeApi
+from .tasks import FrameBudgetedExecutor, VISIBLE, NORMAL, BACKGROUND
+from .scripts import PageStyleScripts, WEB_VIEWS
+from .stylesheets import ExternalStyleSheets
+from .webviews import WebViewBackgrounds, existing_web_views
 from .config import Config, ConfigValueGetter
-from .css_class import inject_css_class
+from .dusk import DuskLadder
+from .editors import BackgroundWorkaround, EditorStyles
+from .engines import ApplicationStyleSheet, NativeStyle
 from .icons import Icons
 from .menu import get_or_create_menu, Menu
-from .stylers import Styler
+from .stylers import Styler, EditorWebViewStyler, ReviewerCards, WebViewBackgroundStyler
 from .styles import Style, MessageBoxStyle
+from .windows import WindowsDispatcher
 
 __addon_name__ = 'Night Mode'
 __version__ = '2.3.3'
@@ -74,12 +90,21 @@ if not appVersion.startswith(__anki_version__):
 
 class StylingManager:
     def __init__(self, app):
-        self.styles = Style.members
+        self.styles = resolution_order(Style.members)
+        # stylers are applied in this order: each after the stylers it requires
         self.stylers = [
             styler(app)
-            for styler in Styler.members
+            for styler in resolution_order(Styler.members)
         ]
         self.config = ConfigValueGetter(app.config)
+        # stylers which patched their targets, in order of application
+        self.live_stylers = []
+        self.windows = WindowsDispatcher()
+        # engines styling the dialogs (other than the default, per-widget style sheets)
+        self.engines = {
+            'application': ApplicationStyleSheet(lambda: self.active_stylers),
+            'native': NativeStyle(app)
+        }
 
     @property
     def active_stylers(self):
@@ -90,16 +115,67 @@ class StylingManager:
         ]
 
     def replace(self):
-        for styler in self.active_stylers:
-            styler.replace_attributes()
+        """Apply all active stylers, or none of them.
+
+        The new values of all the attributes are computed before any
+        of the targets is modified; if patching fails, all the patches
+        (including these of the previously applied stylers) are reverted.
+        """
+        plans = [
+            (styler, styler.plan())
+            for styler in self.active_stylers
+        ]
+        previously_live = self.live_stylers
+        applied = []
+
+        try:
+            for styler, patches in plans:
+                # added first, so the partially applied styler is reverted too
+                applied.append(styler)
+                styler.apply(patches)
+        except Exception:
+            self.live_stylers = previously_live + [styler for styler in applied if styler not in previously_live]
+            self.restore()
+            raise
+
+        for styler in previously_live:
+            if styler not in applied:
+                styler.restore_attributes()
+
+        self.live_stylers = applied
+        self.windows.install(self.active_stylers)
+        self.apply_engine()
 
     def restore(self):
-        for styler in self.stylers:
+        for styler in reversed(self.live_stylers):
             styler.restore_attributes()
+        self.live_stylers = []
+        self.windows.uninstall()
+        for engine in self.engines.values():
+            engine.restore()
+
+    def page_css(self, web_view, state):
+        """CSS of the live stylers for given web view of the main window, when in given state"""
+        return ''.join(
+            styler.page_css_of(web_view, state)
+            for styler in self.live_stylers
+            if styler.uses_page_scripts
+        )
+
+    def apply_engine(self):
+        selected = self.config.styling_engine if self.config.enable_in_dialogs else None
+
+        for name, engine in self.engines.items():
+            if name == selected:
+                engine.apply()
+            else:
+                engine.restore()
 
 
 class NightMode:
 
+    version = __version__
+
     menu_layout = [
         EnableNightMode,
         EnableInDialogs,
@@ -114,18 +190,46 @@ class NightMode:
         '-',
         ModeSettings,
         UserColorMap,
+        CardOverrides,
+        AdaptNoteTypesCss,
+        RewriteColorsInHtml,
+        ColorRewrites,
         DisabledStylers,
+        StylingEngine,
+        CssInjection,
         StyleScrollBars,
+        ExportTheme,
+        ImportTheme,
+        '-',
+        CacheCards,
+        PrefillCardsCache,
+        PrefetchCards,
+        RemoveWhiteBackgrounds,
         '-',
         About
     ]
 
     def __init__(self):
         self.profile_loaded = False
+        self.api = NightModeApi(self)
         self.config = Config(self, prefix='nm_')
         self.config.init_settings()
         self.icons = Icons(mw)
+        self.theme_bundle = ThemeBundle(self)
+        self.style_sheets = ExternalStyleSheets()
         self.styles = StylingManager(self)
+        self.profiler = Profiler()
+        self.refresh_scheduler = RefreshScheduler(self)
+        self.executor = FrameBudgetedExecutor(self.profiler)
+        self.cards_cache = RenderedCardsCache()
+        self.prefetcher = Prefetcher(self)
+        self.notetypes = NoteTypesAnalyzer()
+        self.cards = CardRenderer(self, self.cards_cache, self.prefetcher)
+        self.background_workaround = BackgroundWorkaround()
+        self.editor_styles = EditorStyles()
+        self.page_scripts = PageStyleScripts()
+        self.web_view_backgrounds = WebViewBackgrounds()
+        self.dusk = DuskLadder()
 
         view_menu = get_or_create_menu('addon_view_menu', '&View')
         self.menu = Menu(
@@ -140,9 +244,20 @@ class NightMode:
         # Disabled, uses delay in __init__.py
         # addHook('profileLoaded', self.load)
 
-        addHook('prepareQA', self.night_class_injection)
+        addHook('night_mode_profile', self.profiler.collect)
+
+        mw.night_mode_api = self.api
+        runHook('night_mode_api_ready', self.api)
 
-        addHook('loadNote', self.background_bug_workaround)
+        # hooks needed only in night mode, added by on() and removed by off()
+        self.hooks = [
+            ('prepareQA', self.night_class_injection),
+            ('showQuestion', self.prefetcher.on_question_shown),
+            ('loadNote', self.background_bug_workaround),
+            ('loadNote', self.register_editor),
+            ('beforeStateChange', self.update_page_scripts)
+        ]
+        self.hooks_added = False
 
     def load(self):
         """
@@ -151,6 +266,15 @@ class NightMode:
         """
         self.config.load()
         self.profile_loaded = True
+        self.cards_cache.open(mw.pm.profileFolder())
+
+        if self.config.adapt_note_types_css.value:
+            self.notetypes.analyze_all()
+
+        try:
+            self.style_sheets.remove_old_files()
+        except OSError as e:
+            print('Night Mode: could not remove old stylesheets:', e)
 
         self.refresh()
         self.update_menu()
@@ -161,24 +285,50 @@ class NightMode:
         self.menu.update_checkboxes(self.config.settings)
 
     def save(self):
+        self.refresh_scheduler.cancel()
+        self.executor.cancel()
         self.config.save()
+        self.cards_cache.close()
+        self.prefetcher.clear()
+        self.notetypes.clear()
 
     def on(self):
         """Turn on night mode."""
         self.styles.replace()
+        self.add_hooks()
         runHook("night_mode_state_changed", True)
 
     def off(self):
-        """Turn off night mode."""
+        """Turn off night mode.
+
+        Nothing of the add-on runs on the rendering paths afterwards:
+        patched attributes are restored and the hooks are removed.
+        """
         self.styles.restore()
+        self.remove_hooks()
+        self.background_workaround.disable_all()
         runHook("night_mode_state_changed", False)
 
+    def add_hooks(self):
+        if not self.hooks_added:
+            for hook, function in self.hooks:
+                addHook(hook, function)
+            self.hooks_added = True
+
+    def remove_hooks(self):
+        if self.hooks_added:
+            for hook, function in self.hooks:
+                remHook(hook, function)
+            self.hooks_added = False
+
     def refresh(self, reload=False):
         """
         Refresh display by re-enabling night or normal mode,
         regenerate customizable css strings.
         """
         state = self.config.state_on.value
+        self.config.invalidate()
+        self.prefetcher.clear()
 
         if not self.profile_loaded:
             alert(ERROR_NO_PROFILE)
@@ -195,7 +345,26 @@ class NightMode:
             alert(ERROR_SWITCH % traceback.format_exc())
             return
 
-        # Reload current screen.
+        # scripts have to be in place before the screens are rendered again
+        self.update_page_scripts()
+        self.update_menu()
+        self.update_dusk()
+        self.config.state_on.schedule()
+
+        # the remaining work is split across the next frames, the visible content first
+        executor = self.executor
+        executor.submit(self.update_web_view_backgrounds, VISIBLE, key='web_view_backgrounds')
+        executor.submit(self.reload_screen, VISIBLE, key='screen')
+        # Redraw toolbar (should be always visible).
+        executor.submit(mw.toolbar.draw, VISIBLE, key='toolbar')
+        executor.submit(self.update_editors, NORMAL, key='editors')
+
+        if state:
+            executor.submit(self.storing_theme_bundle(), BACKGROUND, key='theme_bundle')
+
+        return True
+
+    def reload_screen(self):
         if mw.state == 'review':
             mw.moveToState('overview')
             mw.moveToState('review')
@@ -204,10 +373,12 @@ class NightMode:
         if mw.state == 'overview':
             mw.overview.refresh()
 
-        # Redraw toolbar (should be always visible).
-        mw.toolbar.draw()
-        self.update_menu()
-        return True
+    def storing_theme_bundle(self):
+        """Save compiled styles, so the next start with the same settings does not build them."""
+        try:
+            yield from self.theme_bundle.storing()
+        except OSError as e:
+            print('Night Mode: could not store the theme bundle:', e)
 
     def about(self):
         about_box = self.message_box()
@@ -225,95 +396,68 @@ class NightMode:
         return box
 
     def night_class_injection(self, html, card, context):
-        html = inject_css_class(self.config.state_on.value, html)
+        html = self.cards.render(html, card, context)
+
+        # not a part of the cached HTML: cards may be moved between decks
+        styler = ReviewerCards.instance
+        if styler.is_active:
+            html += styler.notetype_style(card) + styler.overrides_style(card)
+
         return html
 
-    def background_bug_workaround(self, editor):
+    def update_page_scripts(self, state=None, *args):
+        """Install (or remove) the scripts with CSS for the web views of the main window.
 
-        if self.config.state_on.value:
-            javascript = """
-            (function bg_bug_workaround()
-            {
-                function getTextNodeAtPosition(root, index){
-                    // Copyright notice:
-                    //
-                    //  following function is based on a function created by Pery Mimon:
-                    //      https://stackoverflow.com/a/38479462
-                    //  and is distributed under CC-BY SA 3.0 license terms:
-                    //      https://creativecommons.org/licenses/by-sa/3.0/
-
-                    var lastNode = null;
-                    var lastIndex = null
-
-                    var treeWalker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT,function next(elem) {
-                        if(index >= elem.textContent.length){
-                            lastIndex = index
-                            index -= elem.textContent.length;
-                            lastNode = elem;
-                            return NodeFilter.FILTER_REJECT
-                        }
-                        return NodeFilter.FILTER_ACCEPT;
-                    });
-                    var c = treeWalker.nextNode();
-                    return {
-                        node: c ? c : lastNode,
-                        position: c ? index : lastIndex
-                    };
-                }
-
-                var regex = /<(span|strong) style="background-color: rgb\(255, 255, 255\);">(.*?)<\/(span|strong)>/gm
-
-                function background_workaround_callback(raw_field)
-                {
-                    function get_rid_of_background(){
-                        var field = $(raw_field)
-                        var html = field.html()
-
-                        if(html.search(regex) == -1)
-                            return
-
-                        var selection = window.getSelection()
-                        var range = selection.getRangeAt(0)
-                        range.setStart(raw_field, 0)
-                        var len = range.toString().length
-
-                        field.html(html.replace(regex, '<$1>$2</$1>'))
-
-                        var range = new Range()
-                        var pos = getTextNodeAtPosition(raw_field, len)
-
-                        range.setStart(pos.node, pos.position)
-
-                        selection.removeAllRanges()
-                        selection.addRange(range)
-                    }
-                    return get_rid_of_background
-                }
-
-                var field = $('.field')
-
-                field.on('keydown', function(e){
-                    var raw_field = this
-                    var get_rid_of_background = background_workaround_callback(raw_field)
-
-                    if(e.which === 8 || e.which == 46){
-                        window.setTimeout(get_rid_of_background, 0)
-                    }
-                })
-
-                field.on('paste', function(){
-                    var raw_field = this
-                    var get_rid_of_background = background_workaround_callback(raw_field)
-
-                    window.setTimeout(get_rid_of_background, 100)
-                })
-
-            })()
-            """
+        Called on every change of the state of the main window, before the new screen is rendered.
+        """
+        state = state or mw.state
+
+        for web_view in WEB_VIEWS:
+            web = getattr(mw, web_view)
+            # only the live stylers contribute, so there is no CSS when night mode is off
+            css = self.styles.page_css(web_view, state)
+            if css:
+                self.page_scripts.install(web, css)
+            else:
+                self.page_scripts.remove(web)
+
+    def update_dusk(self):
+        """Dim the screens of the main window if in the dusk before the automatic night mode starts."""
+        mode_settings = self.config.mode_settings
+        step = 0 if self.config.state_on.value else mode_settings.dusk_step()
+
+        if step:
+            self.dusk.prepare(mode_settings.dusk_steps)
+            self.dusk.apply(step)
+        else:
+            self.dusk.clear()
+
+    def update_web_view_backgrounds(self):
+        """Set backgrounds of pages of all web views, or restore the original ones."""
+        styler = WebViewBackgroundStyler.instance
+
+        if self.config.state_on.value and styler.is_active:
+            styler.style_existing()
         else:
-            javascript = ''
+            self.web_view_backgrounds.restore_all()
+
+    @property
+    def editor_css(self):
+        return EditorWebViewStyler.instance.live_css
 
-        editor.web.eval(javascript)
+    def register_editor(self, editor):
+        self.editor_styles.register(editor, self.editor_css)
+
+    def update_editors(self):
+        """Update the styles of all open editors, without reloading them."""
+        css = self.editor_css
+        if css:
+            # editors opened when night mode was off were not registered
+            self.editor_styles.track(existing_web_views(EditorWebView))
+        self.editor_styles.update_all(css)
+
+    def background_bug_workaround(self, editor):
+        self.background_workaround.update(editor, self.config.state_on.value)
 
 
 ERROR_NO_PROFILE = """Switching night mode failed: The profile is not loaded yet.
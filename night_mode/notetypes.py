@@ -0,0 +1,189 @@
+import re
+from colorsys import rgb_to_hls, hls_to_rgb
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from aqt import mw
+
+from .qss import COMMENT, RULE, split_selector
+
+
+# declarations with colors which are adapted (other properties are left untouched)
+COLOR_PROPERTIES = {
+    'color', 'background', 'background-color',
+    'border', 'border-color', 'border-top', 'border-right', 'border-bottom', 'border-left',
+    'border-top-color', 'border-right-color', 'border-bottom-color', 'border-left-color',
+    'outline', 'outline-color'
+}
+
+# light named colors commonly used in templates, and black
+NAMED_COLORS = {
+    'white': (255, 255, 255),
+    'snow': (255, 250, 250),
+    'ivory': (255, 255, 240),
+    'beige': (245, 245, 220),
+    'whitesmoke': (245, 245, 245),
+    'gainsboro': (220, 220, 220),
+    'lightgray': (211, 211, 211),
+    'lightgrey': (211, 211, 211),
+    'silver': (192, 192, 192),
+    'black': (0, 0, 0)
+}
+
+NUMERIC_COLOR = (
+    r'#(?:[0-9a-f]{6}|[0-9a-f]{3})\b'
+    r'|rgba?\(\s*\d+\s*,\s*\d+\s*,\s*\d+\s*(?:,\s*[\d.]+\s*)?\)'
+)
+COLOR = re.compile(NUMERIC_COLOR + r'|\b(?:' + '|'.join(NAMED_COLORS) + r')\b', re.IGNORECASE)
+# names of colors could be a part of file names of images
+COLOR_NEXT_TO_URL = re.compile(NUMERIC_COLOR, re.IGNORECASE)
+DECLARATION = re.compile(r'([\w-]+)\s*:\s*([^;]+)')
+KEYFRAME = re.compile(r'^(from|to|[\d.]+%)$')
+
+
+def parse_color(color):
+    """Return (red, green, blue, alpha) of a color matched by COLOR"""
+    color = color.lower()
+
+    if color in NAMED_COLORS:
+        return NAMED_COLORS[color] + (None,)
+
+    if color.startswith('#'):
+        digits = color[1:]
+        if len(digits) == 3:
+            digits = ''.join(digit * 2 for digit in digits)
+        return tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4)) + (None,)
+
+    values = [value.strip() for value in color[color.index('(') + 1:-1].split(',')]
+    alpha = values[3] if len(values) == 4 else None
+    return tuple(int(value) for value in values[:3]) + (alpha,)
+
+
+def invert_lightness(color):
+    """Invert lightness of a color, keeping its hue and saturation (so white becomes black, not cyan)."""
+    red, green, blue, alpha = parse_color(color)
+    hue, lightness, saturation = rgb_to_hls(red / 255, green / 255, blue / 255)
+    red, green, blue = (
+        min(255, round(value * 255))
+        for value in hls_to_rgb(hue, 1 - lightness, saturation)
+    )
+
+    if alpha is not None:
+        return f'rgba({red},{green},{blue},{alpha})'
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def night_selectors(selector):
+    """Selectors restricted to the night mode, with higher specificity than the given one."""
+    type_name, rest, remainder = split_selector(selector)
+
+    if type_name == 'html':
+        # the night_mode class is set on the body
+        return []
+    if type_name == 'body':
+        return [f'body.night_mode{rest}{remainder}']
+
+    selectors = [f'.night_mode {selector}']
+
+    if not type_name:
+        # the first compound may match the body itself (e.g. ".card")
+        selectors.append(f'.night_mode{rest}{remainder}')
+
+    return selectors
+
+
+def dark_variant(css):
+    """Generate CSS rules adapting the colors of the CSS of a note type to the night mode.
+
+    Declarations of colors are copied with inverted lightness, for selectors
+    limited to the night mode; the other declarations are skipped.
+    """
+    css = COMMENT.sub('', css)
+    rules = []
+
+    for selectors, declarations in RULE.findall(css):
+        selectors = [
+            selector.strip()
+            for selector in selectors.split(',')
+            if selector.strip()
+        ]
+        if any(selector.startswith('@') or KEYFRAME.match(selector) for selector in selectors):
+            continue
+
+        adapted = []
+        for name, value in DECLARATION.findall(declarations):
+            name = name.lower()
+            pattern = COLOR_NEXT_TO_URL if 'url(' in value else COLOR
+            if name in COLOR_PROPERTIES and pattern.search(value):
+                value = pattern.sub(lambda match: invert_lightness(match.group(0)), value.strip())
+                adapted.append(f'{name}:{value}')
+
+        if not adapted:
+            continue
+
+        night = [
+            night_selector
+            for selector in selectors
+            for night_selector in night_selectors(selector)
+        ]
+        if night:
+            rules.append(','.join(night) + '{' + ';'.join(adapted) + '}')
+
+    return ''.join(rules)
+
+
+class NoteTypesAnalyzer:
+    """Generates dark variants of the CSS of note types.
+
+    Results are kept per note type along with its modification time,
+    so the CSS is analysed again only when the note type changes.
+    All note types are analysed in a background thread when the profile
+    loads; a note type modified later is analysed when its card is shown.
+    """
+
+    def __init__(self):
+        # note type id => (modification time, CSS)
+        self.variants = {}
+        self.lock = Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def analyze_all(self):
+        # the collection is accessed in the main thread only
+        models = [
+            (model['id'], model['mod'], model['css'])
+            for model in mw.col.models.all()
+        ]
+        self.executor.submit(self.analyze, models)
+
+    def analyze(self, models):
+        for mid, mod, css in models:
+            with self.lock:
+                entry = self.variants.get(mid)
+            if entry and entry[0] == mod:
+                continue
+
+            variant = dark_variant(css)
+
+            with self.lock:
+                self.variants[mid] = mod, variant
+
+    def css(self, model):
+        """Dark variant of the CSS of given note type"""
+        mid, mod = model['id'], model['mod']
+
+        with self.lock:
+            entry = self.variants.get(mid)
+
+        if entry and entry[0] == mod:
+            return entry[1]
+
+        variant = dark_variant(model['css'])
+
+        with self.lock:
+            self.variants[mid] = mod, variant
+
+        return variant
+
+    def clear(self):
+        with self.lock:
+            self.variants.clear()
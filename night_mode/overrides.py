@@ -0,0 +1,227 @@
+from PyQt5.QtCore import Qt, pyqtSlot as slot
+from PyQt5.QtWidgets import QLabel, QComboBox, QCheckBox, QGridLayout, QHBoxLayout, QVBoxLayout
+
+from .color_map import ColorSwatch, ColorMapWindow
+from .gui import create_button, AddonDialog
+from .languages import _
+
+
+# flags which may be left undecided (partially checked) to follow the global settings
+FLAGS = {
+    'invert_image': 'Invert images',
+    'invert_latex': 'Invert LaTeX expressions'
+}
+
+COLORS = {
+    'color_t': 'Text color',
+    'color_b': 'Background color'
+}
+
+CHECK_STATES = {
+    None: Qt.PartiallyChecked,
+    True: Qt.Checked,
+    False: Qt.Unchecked
+}
+
+
+class OverridesWindow(AddonDialog):
+    """Edits night mode styles overridden for cards of chosen note types and decks.
+
+    The overrides are modified in place, as in the ColorMapWindow.
+    """
+
+    def __init__(self, parent, overrides, note_types, decks, title='Customise note types and decks', on_update=None):
+        """
+
+        Args:
+            parent: a parent Qt instance
+            overrides: dict with 'notetypes' and 'decks' dicts, mapping ids (as strings) to overrides
+            note_types: list of (id, name) pairs
+            decks: list of (id, name) pairs
+        """
+        super().__init__(self, parent, Qt.Window)
+        self.overrides = overrides
+        self.on_update = on_update
+        self.color_map_window = None
+
+        # (kind, id) for entries of the combo box
+        self.targets = [
+            ('notetypes', str(mid))
+            for mid, name in note_types
+        ] + [
+            ('decks', str(did))
+            for did, name in decks
+        ]
+        self.labels = [
+            _('Note type: %s') % name
+            for mid, name in note_types
+        ] + [
+            _('Deck: %s') % name
+            for did, name in decks
+        ]
+
+        self.init_ui(title)
+
+    def init_ui(self, title):
+        self.setWindowTitle(_(title))
+
+        header = QLabel(_(
+            'Choose a note type or a deck to style its cards differently. '
+            'Partially checked boxes and unspecified colors follow the global settings; '
+            'overrides of note types take precedence over these of decks.'
+        ))
+        header.setWordWrap(True)
+
+        self.target_choice = QComboBox()
+        self.target_choice.addItems(self.labels)
+        self.target_choice.currentIndexChanged.connect(self.load_target)
+
+        grid = QGridLayout()
+
+        self.checkboxes = {}
+        for row, (key, label) in enumerate(FLAGS.items()):
+            checkbox = QCheckBox(_(label))
+            checkbox.setTristate(True)
+            checkbox.stateChanged.connect(self.update)
+            grid.addWidget(checkbox, row, 0, 1, 3)
+            self.checkboxes[key] = checkbox
+
+        self.swatches = {}
+        for row, (key, label) in enumerate(COLORS.items(), len(FLAGS)):
+            swatch = ColorSwatch(self, None, self.update_colors, label)
+            grid.addWidget(QLabel(_(label)), row, 0)
+            grid.addWidget(swatch, row, 1)
+            grid.addWidget(create_button('Clear', lambda checked=False, key=key: self.clear_color(key)), row, 2)
+            self.swatches[key] = swatch
+
+        btn_color_map = create_button('Customise colors on cards', self.on_color_map)
+        btn_reset = create_button('Reset', self.reset)
+        btn_close = create_button('Close', self.close)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(btn_close)
+        buttons.addWidget(btn_reset)
+        buttons.addWidget(btn_color_map)
+        buttons.setAlignment(Qt.AlignBottom)
+
+        body = QVBoxLayout()
+        body.setAlignment(Qt.AlignTop)
+        body.addWidget(header)
+        body.addWidget(self.target_choice)
+        body.addLayout(grid)
+        body.addStretch(1)
+        body.addLayout(buttons)
+        self.setLayout(body)
+
+        self.load_target()
+
+        self.setGeometry(300, 300, 400, 250)
+        self.show()
+
+    @property
+    def target(self):
+        index = self.target_choice.currentIndex()
+        return self.targets[index] if index != -1 else None
+
+    @property
+    def current(self):
+        """Overrides of the chosen note type or deck (not stored unless modified)"""
+        kind, target_id = self.target
+        return self.overrides[kind].get(target_id, {})
+
+    def store(self, overrides, target=None):
+        kind, target_id = target or self.target
+        if overrides:
+            self.overrides[kind][target_id] = overrides
+        else:
+            self.overrides[kind].pop(target_id, None)
+
+        if self.on_update:
+            self.on_update()
+
+    @slot()
+    def load_target(self):
+        if not self.target:
+            return
+
+        current = self.current
+
+        for key, checkbox in self.checkboxes.items():
+            checkbox.blockSignals(True)
+            checkbox.setCheckState(CHECK_STATES[current.get(key)])
+            checkbox.blockSignals(False)
+
+        for key, swatch in self.swatches.items():
+            color = current.get(key)
+            if color:
+                swatch.set_color(color)
+            else:
+                swatch.color = None
+                swatch.setStyleSheet('')
+                swatch.setText(_('(Not specified)'))
+
+    @slot()
+    def update(self):
+        if not self.target:
+            return
+
+        overrides = dict(self.current)
+
+        for key, checkbox in self.checkboxes.items():
+            state = checkbox.checkState()
+            if state == Qt.PartiallyChecked:
+                overrides.pop(key, None)
+            else:
+                overrides[key] = state == Qt.Checked
+
+        for key, swatch in self.swatches.items():
+            if swatch.color:
+                overrides[key] = swatch.color
+            else:
+                overrides.pop(key, None)
+
+        self.store(overrides)
+
+    def update_colors(self, old, new):
+        self.update()
+
+    def clear_color(self, key):
+        swatch = self.swatches[key]
+        swatch.color = None
+        swatch.setStyleSheet('')
+        swatch.setText(_('(Not specified)'))
+        self.update()
+
+    @slot()
+    def reset(self):
+        if self.target:
+            self.store({})
+            self.load_target()
+
+    @slot()
+    def on_color_map(self):
+        if not self.target:
+            return
+
+        target = self.target
+        color_map = dict(self.current.get('user_color_map', {}))
+
+        def on_colors_changed():
+            # an empty map is not stored, so merely opening the window does not add an override
+            kind, target_id = target
+            overrides = dict(self.overrides[kind].get(target_id, {}))
+            if color_map:
+                overrides['user_color_map'] = color_map
+            else:
+                overrides.pop('user_color_map', None)
+            self.store(overrides, target)
+
+        if self.color_map_window:
+            self.color_map_window.close()
+
+        self.color_map_window = ColorMapWindow(
+            self,
+            color_map,
+            header='Specify how particular colors on cards of %s should be swapped.' % self.target_choice.currentText(),
+            on_update=on_colors_changed
+        )
@@ -0,0 +1,140 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import perf_counter
+
+from aqt import mw
+
+from .cards import transform, checksum, source_html, is_trivial
+from .tasks import BACKGROUND
+
+
+def upcoming_card_ids(scheduler, limit):
+    """Best guess of the ids of cards which the scheduler will show next.
+
+    Both versions of the scheduler pop cards from the end of the queues,
+    except for the learning queue which is a heap sorted by the due time.
+    """
+    learning = [
+        entry[1] if isinstance(entry, (tuple, list)) else entry
+        for entry in sorted(getattr(scheduler, '_lrnQueue', []))[:limit]
+    ]
+    card_ids = learning
+
+    for queue_name in ['_lrnDayQueue', '_revQueue', '_newQueue']:
+        queue = getattr(scheduler, queue_name, [])
+        card_ids.extend(reversed(queue[-limit:]))
+
+    return list(OrderedDict.fromkeys(card_ids))[:limit]
+
+
+class Prefetcher:
+    """Transforms the upcoming cards in a background thread while the current one is displayed.
+
+    Anki renders the HTML of cards in the main thread (the collection
+    cannot be shared between threads), which is the main cost of prefetching:
+    the cards are rendered one per slice of the frame-budgeted executor, after
+    the current card was shown, and the time is reported by the profiler
+    (prefetch_main_thread_time). Only the night mode transformations run
+    in the background, so prefetching is skipped when these are trivial.
+    The results are kept in a small buffer, consumed by CardRenderer.
+    """
+
+    look_ahead = 3
+    delay = 50
+
+    def __init__(self, app):
+        self.app = app
+        self.buffer = OrderedDict()
+        self.lock = Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.generation = 0
+
+    @property
+    def enabled(self):
+        return self.app.config.prefetch_cards.value
+
+    @property
+    def capacity(self):
+        # the answer of the current card and questions of the upcoming ones, twice
+        return 2 * (self.look_ahead + 1)
+
+    def on_question_shown(self):
+        if self.enabled and not is_trivial(self.app.cards.options):
+            # let the reviewer finish displaying the card first
+            mw.progress.timer(self.delay, self.prefetch, False)
+
+    def prefetch(self):
+        card = mw.reviewer.card
+
+        if mw.state != 'review' or not card:
+            return
+
+        self.app.executor.submit(self.rendering(card), BACKGROUND, key='prefetch')
+
+    def rendering(self, current):
+        """Render the upcoming cards in the main thread, one side per step, transforming them in background."""
+        renderer = self.app.cards
+        options = renderer.options
+        generation = self.generation
+        profiler = self.app.profiler
+
+        upcoming = [(current.id, 'a')] + [
+            (card_id, 'q')
+            for card_id in upcoming_card_ids(mw.col.sched, self.look_ahead)
+            if card_id != current.id
+        ]
+
+        for card_id, side in upcoming:
+            # stop if the reviewer moved on to another card, or the settings changed
+            if generation != self.generation or mw.reviewer.card is not current:
+                return
+
+            start = perf_counter()
+            card = current if card_id == current.id else mw.col.getCard(card_id)
+            key = renderer.key(card, side, options)
+
+            with self.lock:
+                buffered = key in self.buffer
+
+            if not buffered:
+                job = key, source_html(card, side)
+
+            profiler.add_time('prefetch_main_thread_time', perf_counter() - start)
+
+            if not buffered:
+                self.executor.submit(self.transform, [job], options, generation)
+
+            yield
+
+    def transform(self, jobs, options, generation):
+        for key, html in jobs:
+            start = perf_counter()
+            result = transform(html, options)
+            elapsed = perf_counter() - start
+
+            with self.lock:
+                if generation != self.generation:
+                    return
+                self.buffer[key] = checksum(html), result, elapsed
+                while len(self.buffer) > self.capacity:
+                    self.buffer.popitem(last=False)
+
+    def take(self, key, source):
+        with self.lock:
+            entry = self.buffer.pop(key, None)
+
+        profiler = self.app.profiler
+
+        if entry and entry[0] == source:
+            source, html, elapsed = entry
+            profiler.count('prefetch_hits')
+            profiler.add_time('prefetch_time_saved', elapsed)
+            return html
+
+        profiler.count('prefetch_misses')
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.buffer.clear()
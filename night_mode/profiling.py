@@ -0,0 +1,59 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+
+class Profiler:
+    """Collects counters and timings of the add-on internals.
+
+    The statistics can be retrieved by other add-ons or from the debug console with:
+        runFilter('night_mode_profile', {})
+    """
+
+    def __init__(self):
+        self.counters = Counter()
+        self.timings = defaultdict(float)
+        self.maxima = {}
+
+    def count(self, name, increment=1):
+        self.counters[name] += increment
+
+    def add_time(self, name, seconds):
+        self.timings[name] += seconds
+
+    def maximum(self, name, value):
+        if value > self.maxima.get(name, float('-inf')):
+            self.maxima[name] = value
+
+    @contextmanager
+    def measure(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter() - start)
+
+    def ratio(self, hits, misses):
+        total = self.counters[hits] + self.counters[misses]
+        return self.counters[hits] / total if total else None
+
+    def report(self):
+        report = dict(self.counters)
+        report.update(self.timings)
+        report.update(self.maxima)
+        report['prefetch_hit_rate'] = self.ratio('prefetch_hits', 'prefetch_misses')
+        # the time saved on the review path minus the time spent rendering the cards ahead in the main thread
+        report['prefetch_net_time_saved'] = (
+            self.timings.get('prefetch_time_saved', 0) - self.timings.get('prefetch_main_thread_time', 0)
+        )
+        report['page_payload_hit_rate'] = self.ratio('page_payload_hits', 'page_payload_builds')
+        return report
+
+    def collect(self, stats):
+        stats.update(self.report())
+        return stats
+
+    def reset(self):
+        self.counters.clear()
+        self.timings.clear()
+        self.maxima.clear()
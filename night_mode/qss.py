@@ -0,0 +1,62 @@
+import re
+
+COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+RULE = re.compile(r'([^{}]+)\{([^{}]*)\}')
+FIRST_COMPOUND = re.compile(r'^([^\s>+~]+)(.*)$', re.DOTALL)
+TYPE = re.compile(r'^([A-Za-z_]\w*|\*)?(.*)$', re.DOTALL)
+
+
+def split_selector(selector):
+    """Split a selector into: type of the first compound, rest of the first compound and the remainder"""
+    compound, remainder = FIRST_COMPOUND.match(selector).groups()
+    type_name, rest = TYPE.match(compound).groups()
+    return type_name or '', rest, remainder
+
+
+def scoped_selectors(selector, scope, object_name=None, window_types=()):
+    type_name, rest, remainder = split_selector(selector)
+
+    if object_name:
+        # as in a style sheet set on the widget: rules apply to the widget itself and to its children
+        return [
+            f'{scope} {type_name}#{object_name}{rest}{remainder}',
+            f'{scope} #{object_name} {selector}'
+        ]
+
+    selectors = [f'{scope} {selector}']
+
+    if type_name in window_types:
+        selectors.append(f'{scope}{rest}{remainder}')
+
+    return selectors
+
+
+def scope_qss(qss, scope, object_name=None, window_types=()):
+    """Restrict rules of a Qt style sheet to descendants of given scope.
+
+    This way style sheets written for particular widgets
+    can be combined into a single application style sheet.
+
+    Args:
+        qss: Qt style sheet
+        scope: selector of the window, e.g. a class name: "Browser"
+        object_name: restrict the rules to a widget (and its children) with given object name
+        window_types: types of the window itself; rules for these types will be applied
+            to the window too, as they would be when set with window.setStyleSheet()
+    """
+    qss = COMMENT.sub('', qss)
+    rules = []
+
+    for selectors, declarations in RULE.findall(qss):
+        if not declarations.strip():
+            continue
+        scoped = [
+            scoped_selector
+            for selector in selectors.split(',')
+            if selector.strip()
+            for scoped_selector in scoped_selectors(selector.strip(), scope, object_name, window_types)
+        ]
+        if scoped:
+            rules.append(', '.join(scoped) + '{' + declarations.strip() + '}')
+
+    return '\n'.join(rules) + '\n'
@@ -0,0 +1,55 @@
+from PyQt5.QtCore import QTimer
+
+
+class RefreshScheduler:
+    """Coalesces requests of refresh coming in bursts (e.g. from settings windows).
+
+    The first request starts a short timer; requests arriving before it
+    fires are merged into the pending one (a reload is performed if any of
+    them asked for it). At most one refresh runs at a time: requests made
+    while refreshing are scheduled after it finishes.
+    """
+
+    delay = 150
+
+    def __init__(self, app):
+        self.app = app
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.run)
+        self.pending = False
+        self.reload = False
+        self.running = False
+
+    def request(self, reload=False):
+        self.app.profiler.count('refresh_requests')
+        self.reload = self.reload or reload
+
+        if not self.pending:
+            self.pending = True
+            self.timer.start(self.delay)
+
+    def run(self):
+        if not self.pending:
+            return
+
+        if self.running:
+            # a refresh may process events (e.g. when showing an alert)
+            self.timer.start(self.delay)
+            return
+
+        reload = self.reload
+        self.pending = False
+        self.reload = False
+        self.running = True
+
+        try:
+            self.app.profiler.count('refreshes')
+            self.app.refresh(reload=reload)
+        finally:
+            self.running = False
+
+    def cancel(self):
+        self.timer.stop()
+        self.pending = False
+        self.reload = False
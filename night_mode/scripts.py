@@ -0,0 +1,89 @@
+import json
+from weakref import WeakKeyDictionary
+
+from PyQt5.QtWebEngineWidgets import QWebEngineScript
+
+
+# web views of the main window which may be styled with scripts
+WEB_VIEWS = ('web', 'bottomWeb', 'toolbarWeb')
+
+
+class PageStyleScripts:
+    """Installs the night mode CSS of web views as scripts run on creation of each document.
+
+    The HTML of the pages stays untouched: the CSS is compiled once per theme
+    and carried by a QWebEngineScript registered on the page of a web view;
+    it is replaced only when the CSS changes (e.g. on change of the theme
+    or of the screen shown by the main web view).
+    """
+
+    name = 'night_mode_style'
+
+    source = """
+    (function()
+    {
+        var style = document.createElement('style')
+        style.id = 'night-mode-style'
+        style.textContent = %(css)s
+
+        function attach()
+        {
+            if(document.documentElement && !style.parentNode)
+                document.documentElement.appendChild(style)
+            return style.parentNode
+        }
+
+        // the document element does not exist yet when the document is created
+        if(!attach())
+        {
+            new MutationObserver(function(mutations, observer)
+            {
+                if(attach())
+                    observer.disconnect()
+            }).observe(document, {childList: true})
+        }
+
+        document.addEventListener('DOMContentLoaded', function()
+        {
+            // after the styles of the page, as with the styles appended to the HTML
+            document.body.appendChild(style)
+            setTimeout(function()
+            {
+                if(document.body.className.indexOf('night_mode') == -1)
+                    document.body.className += ' night_mode'
+            }, 0)
+        })
+    })()
+    """
+
+    def __init__(self):
+        # page => CSS of the installed script
+        self.installed = WeakKeyDictionary()
+
+    def install(self, web, css):
+        page = web.page()
+
+        if self.installed.get(page) == css:
+            return
+
+        self.remove(web)
+
+        script = QWebEngineScript()
+        script.setName(self.name)
+        script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+        script.setWorldId(QWebEngineScript.MainWorld)
+        script.setRunsOnSubFrames(False)
+        script.setSourceCode(self.source % {'css': json.dumps(css)})
+
+        page.scripts().insert(script)
+        self.installed[page] = css
+
+    def remove(self, web):
+        page = web.page()
+        scripts = page.scripts()
+
+        script = scripts.findScript(self.name)
+        if not script.isNull():
+            scripts.remove(script)
+
+        self.installed.pop(page, None)
@@ -1,5 +1,8 @@
+from inspect import isclass
+
 from PyQt5.QtCore import Qt
 from PyQt5 import QtWidgets
+from PyQt5.QtWidgets import QDialog
 
 import aqt
 from anki.stats import CollectionStats
@@ -11,8 +14,10 @@ from aqt.editcurrent import EditCurrent
 from aqt.editor import Editor
 from aqt.progress import ProgressManager
 from aqt.stats import DeckStats
+from aqt.webview import AnkiWebView
 from .gui import AddonDialog, iterate_widgets
 
+from .color_rewrites import compile_css
 from .config import ConfigValueGetter
 from .css_class import inject_css_class
 from .internals import percent_escaped, move_args_to_kwargs, from_utf8, PropertyDescriptor
@@ -20,15 +25,38 @@ from .internals import style_tag, wraps, appends_in_night_mode, replaces_in_nigh
 from .styles import SharedStyles, ButtonsStyle, ImageStyle, DeckStyle, LatexStyle, DialogStyle
 from .internals import SnakeNameMixin, StylerMetaclass, abstract_property
 from .internals import RequiringMixin
+from .qss import scope_qss
+from .tasks import VISIBLE
+from .webviews import existing_web_views
+
+
+# types of windows, as used to scope the rules of the application style sheet
+DIALOG = ('QDialog', 'QWidget')
+MAIN_WINDOW = ('QMainWindow', 'QWidget')
 
 
 class Styler(RequiringMixin, SnakeNameMixin, metaclass=StylerMetaclass):
 
+    # classes of windows (including their subclasses) styled with style_window() when shown
+    windows = ()
+
+    # fallback stylers are used only for windows not handled by any other styler
+    fallback = False
+
+    # stylers which only add CSS to pages of the main window declare the web view
+    # (an attribute of the main window) and the states of the main window (None for all)
+    # in which their `page_css` applies, so it can be injected with scripts instead
+    web_view = None
+    screens = None
+
     def __init__(self, app):
         RequiringMixin.__init__(self, app)
         self.app = app
         self.config = ConfigValueGetter(app.config)
         self.original_attributes = {}
+        # name => HTML with CSS for pages, valid for the settings generation below
+        self.payloads = {}
+        self.payloads_generation = None
 
     @abstract_property
     def target(self):
@@ -39,24 +67,117 @@ class Styler(RequiringMixin, SnakeNameMixin, metaclass=StylerMetaclass):
         return self.name not in self.config.disabled_stylers
 
     @property
-    def friendly_name(self):
-        name = self.name.replace('_styler', '')
-        return name.replace('_', ' ').title()
+    def uses_widget_style_sheets(self):
+        """Should styles be set on widgets directly (rather than by one of the application-wide engines)?"""
+        return self.config.styling_engine == 'widgets'
+
+    def style_window(self, window):
+        """Style a top-level window of one of the `windows` classes.
+
+        Called when the window is first shown, and for open windows whenever the theme changes;
+        style sheets have to be set with set_style_sheet(), so they can be reverted.
+        """
+        pass
+
+    def set_style_sheet(self, widget, style_sheet):
+        """Set style sheet of a widget of a window, so it can be reverted when the theme changes."""
+        self.app.styles.windows.set_style_sheet(widget, style_sheet)
+
+    def set_property(self, widget, name, value):
+        """Set a Qt property of a widget of a window, so it can be reverted when the theme changes."""
+        self.app.styles.windows.set_property(widget, name, value)
+
+    @property
+    def page_css(self):
+        return ''
+
+    def page_css_of(self, web_view, state):
+        """CSS for given web view of the main window, when the main window is in given state"""
+        if self.web_view == web_view and (self.screens is None or state in self.screens):
+            return self.page_css
+        return ''
+
+    def page_style(self, css, escaped=True):
+        """HTML adding the CSS to a page: either embedded or (depending on settings) linked from a file.
+
+        Args:
+            css: the CSS
+            escaped: should percent signs be escaped (for HTML templates used with % operator)
+        """
+        style_sheets = self.app.style_sheets
+
+        if self.config.css_injection == 'files' and style_sheets.available:
+            try:
+                return style_sheets.link(css)
+            except OSError as e:
+                print('Night Mode: could not write the stylesheet:', e)
+
+        if escaped:
+            css = percent_escaped(css)
+        return style_tag(css)
+
+    def cached_page_style(self, name, compute_css, escaped=True):
+        """HTML of page_style() for CSS returned by compute_css, built once per generation of settings.
+
+        Empty CSS gives an empty string.
+
+        For pages rendered repeatedly (e.g. in the review loop),
+        hits and builds are counted by the profiler.
+        """
+        generation = (self.app.config.fingerprint, self.config.css_injection)
+
+        if generation != self.payloads_generation:
+            self.payloads = {}
+            self.payloads_generation = generation
+
+        profiler = self.app.profiler
+        try:
+            payload = self.payloads[name]
+            profiler.count('page_payload_hits')
+        except KeyError:
+            css = compute_css()
+            payload = self.page_style(css, escaped) if css else ''
+            self.payloads[name] = payload
+            profiler.count('page_payload_builds')
+
+        return payload
+
+    @property
+    def uses_page_scripts(self):
+        return self.web_view is not None and self.config.css_injection == 'scripts'
+
+    def is_own_attribute(self, key):
+        """Is the attribute defined directly on the target (rather than inherited from its class)?"""
+        if key in vars(self.target):
+            return True
+        # assignments to properties are handled by their setters, so these have to be restored by assignment too
+        return not isclass(self.target) and hasattr(getattr(type(self.target), key, None), '__set__')
 
     def get_or_create_original(self, key):
         if key not in self.original_attributes:
             original = getattr(self.target, key)
-            self.original_attributes[key] = original
+            self.original_attributes[key] = (original, self.is_own_attribute(key))
         else:
-            original = self.original_attributes[key]
+            original, own = self.original_attributes[key]
 
         return original
 
-    def replace_attributes(self):
+    def plan(self):
+        """Compute the new values of the attributes of the target, without modifying it.
+
+        Returns:
+            list of (attribute name, value) pairs
+        """
+        patches = []
+
+        if self.uses_page_scripts:
+            # the CSS is injected by PageStyleScripts, the pages are not modified
+            return patches
+
         try:
             for key, addition in self.additions.items():
                 original = self.get_or_create_original(key)
-                setattr(self.target, key, original + addition.value(self))
+                patches.append((key, original + addition.value(self)))
 
             for key, replacement in self.replacements.items():
                 self.get_or_create_original(key)
@@ -64,28 +185,44 @@ class Styler(RequiringMixin, SnakeNameMixin, metaclass=StylerMetaclass):
                 if isinstance(replacement, PropertyDescriptor):
                     replacement = replacement.value(self)
 
-                setattr(self.target, key, replacement)
+                patches.append((key, replacement))
 
         except (AttributeError, TypeError):
             print('Failed to inject style to:', self.target, key, self.name)
             raise
 
+        return patches
+
+    def apply(self, patches):
+        for key, value in patches:
+            setattr(self.target, key, value)
+
+    def replace_attributes(self):
+        self.apply(self.plan())
+
     def restore_attributes(self):
-        for key, original in self.original_attributes.items():
-            setattr(self.target, key, original)
+        for key, (original, own) in self.original_attributes.items():
+            if own:
+                setattr(self.target, key, original)
+            elif key in vars(self.target):
+                # remove the patch, uncovering the attribute of the class
+                delattr(self.target, key)
 
 
 class ToolbarStyler(Styler):
 
     target = mw.toolbar
+    web_view = 'toolbarWeb'
     require = {
         SharedStyles
     }
 
     @appends_in_night_mode
-    @style_tag
-    @percent_escaped
     def _body(self):
+        return self.page_style(self.page_css)
+
+    @css
+    def page_css(self):
         return self.shared.top
 
 
@@ -105,6 +242,9 @@ class StyleSetter:
 
 class MenuStyler(Styler):
     target = StyleSetter(mw)
+    require = {
+        SharedStyles
+    }
 
     @appends_in_night_mode
     def css(self):
@@ -114,6 +254,8 @@ class MenuStyler(Styler):
 class ReviewerStyler(Styler):
 
     target = mw.reviewer
+    web_view = 'bottomWeb'
+    screens = ('review',)
     require = {
         SharedStyles,
         ButtonsStyle
@@ -121,9 +263,13 @@ class ReviewerStyler(Styler):
 
     @wraps(position='around')
     def _bottomHTML(self, reviewer, _old):
-        return _old(reviewer) + style_tag(percent_escaped(self.bottom_css))
+        return _old(reviewer) + self.cached_page_style('bottom', lambda: self.bottom_css)
 
     @property
+    def page_css(self):
+        return self.bottom_css
+
+    @css
     def bottom_css(self):
         return self.buttons.html + self.shared.colors_replacer + """
         body, #outer
@@ -146,7 +292,10 @@ class ReviewerStyler(Styler):
 class ReviewerCards(Styler):
 
     target = mw.reviewer
+    web_view = 'web'
+    screens = ('review',)
     require = {
+        SharedStyles,
         LatexStyle,
         ImageStyle
     }
@@ -154,7 +303,11 @@ class ReviewerCards(Styler):
     # TODO: it can be implemented with a nice decorator
     @wraps(position='around')
     def revHtml(self, reviewer, _old):
-        return _old(reviewer) + style_tag(percent_escaped(self.body))
+        return _old(reviewer) + self.cached_page_style('body', lambda: self.body)
+
+    @property
+    def page_css(self):
+        return self.body
 
     @css
     def body(self):
@@ -214,7 +367,11 @@ class ReviewerCards(Styler):
         }
         """
 
-        css = css_body + card_color + self.shared.user_color_map + self.shared.body_colors
+        css = css_body + card_color + self.shared.body_colors
+
+        # otherwise colors are rewritten directly in the HTML of cards
+        if not self.config.rewrite_colors_in_html:
+            css += self.shared.user_color_map
 
         if self.config.invert_image:
             css += self.image.invert
@@ -223,10 +380,68 @@ class ReviewerCards(Styler):
 
         return css
 
+    def notetype_style(self, card):
+        """Style with dark variants of the colors declared by the note type of the card"""
+        if not self.config.adapt_note_types_css:
+            return ''
+
+        model = card.model()
+        return self.cached_page_style(
+            ('notetype', model['id'], model['mod']),
+            lambda: self.app.notetypes.css(model),
+            escaped=False
+        )
+
+    def overrides_style(self, card):
+        """Style overriding the CSS of cards for the note type and the deck of the card.
+
+        The CSS is compiled once for each pair of note type and deck (until the settings change),
+        so choosing it while rendering a card takes a couple of dictionary lookups.
+        """
+        mid = card.note().mid
+        did = card.odid or card.did
+        overrides = self.app.config.card_overrides.for_card(mid, did)
+
+        if not overrides:
+            return ''
+
+        return self.cached_page_style(
+            ('overrides', mid, did),
+            lambda: self.overrides_css(overrides),
+            escaped=False
+        )
+
+    def overrides_css(self, overrides):
+        # the style is a part of the card, preceding the global CSS in the document,
+        # so the rules are scoped by html (and marked important) to take precedence
+        css = ''
+
+        text_color = overrides.get('color_t')
+        if text_color:
+            css += f'html .card, html body{{color:{text_color}!important}}'
+
+        background_color = overrides.get('color_b')
+        if background_color:
+            css += f'html body{{background-color:{background_color}!important}}'
+
+        for key, selector in [('invert_image', 'img'), ('invert_latex', '.latex')]:
+            invert = overrides.get(key)
+            if invert is not None and invert != getattr(self.config, key):
+                value = 'invert(1)' if invert else 'none'
+                css += f'html {selector}{{filter:{value}!important;-webkit-filter:{value}!important}}'
+
+        color_map = overrides.get('user_color_map')
+        if color_map:
+            css += compile_css(color_map, elements=('font',), scope='html')
+
+        return css
+
 
 class DeckBrowserStyler(Styler):
 
     target = mw.deckBrowser
+    web_view = 'web'
+    screens = ('deckBrowser',)
     require = {
         SharedStyles,
         DeckStyle
@@ -234,26 +449,38 @@ class DeckBrowserStyler(Styler):
 
     @appends_in_night_mode
     def _body(self):
-        styles_html = style_tag(percent_escaped(self.deck.style + self.shared.body_colors))
+        styles_html = self.page_style(self.page_css)
         return inject_css_class(True, styles_html)
 
+    @css
+    def page_css(self):
+        return self.deck.style + self.shared.body_colors
+
 
 class DeckBrowserBottomStyler(Styler):
 
     target = mw.deckBrowser.bottom
+    web_view = 'bottomWeb'
+    screens = ('deckBrowser',)
     require = {
         DeckStyle
     }
 
     @appends_in_night_mode
     def _centerBody(self):
-        styles_html = style_tag(percent_escaped(self.deck.bottom))
+        styles_html = self.page_style(self.page_css)
         return inject_css_class(True, styles_html)
 
+    @property
+    def page_css(self):
+        return self.deck.bottom
+
 
 class OverviewStyler(Styler):
 
     target = mw.overview
+    web_view = 'web'
+    screens = ('overview',)
     require = {
         SharedStyles,
         ButtonsStyle
@@ -261,9 +488,13 @@ class OverviewStyler(Styler):
 
     @appends_in_night_mode
     def _body(self):
-        styles_html = style_tag(percent_escaped(self.css))
+        styles_html = self.page_style(self.css)
         return inject_css_class(True, styles_html)
 
+    @property
+    def page_css(self):
+        return self.css
+
     @css
     def css(self):
         return f"""
@@ -280,20 +511,25 @@ class OverviewStyler(Styler):
 class OverviewBottomStyler(Styler):
 
     target = mw.overview.bottom
+    web_view = 'bottomWeb'
+    screens = ('overview',)
     require = {
         DeckStyle
     }
 
     @appends_in_night_mode
-    @style_tag
-    @percent_escaped
     def _centerBody(self):
+        return self.page_style(self.page_css)
+
+    @property
+    def page_css(self):
         return self.deck.bottom
 
 
 class AnkiWebViewStyler(Styler):
 
     target = mw.web
+    web_view = 'web'
     require = {
         SharedStyles,
         ButtonsStyle
@@ -305,7 +541,7 @@ class AnkiWebViewStyler(Styler):
 
         args, kwargs = move_args_to_kwargs(old, [web] + list(args), kwargs)
 
-        kwargs['head'] = kwargs.get('head', '') + style_tag(self.waiting_screen)
+        kwargs['head'] = kwargs.get('head', '') + self.page_style(self.waiting_screen, escaped=False)
 
         return old(web, *args[1:], **kwargs)
 
@@ -313,6 +549,31 @@ class AnkiWebViewStyler(Styler):
     def waiting_screen(self):
         return self.buttons.html + self.shared.body_colors
 
+    @property
+    def page_css(self):
+        return self.waiting_screen
+
+
+class WebViewBackgroundStyler(Styler):
+    """Dark background of pages of web views, set before any content is loaded"""
+
+    target = AnkiWebView
+
+    @wraps
+    def init(self, web, *args, **kwargs):
+        # web views created after start-up belong to dialogs
+        if self.config.enable_in_dialogs:
+            self.app.web_view_backgrounds.set(web, self.config.color_b)
+
+    def style_existing(self):
+        backgrounds = self.app.web_view_backgrounds
+        web_views = [
+            web
+            for web in existing_web_views(AnkiWebView)
+            if self.config.enable_in_dialogs or web.window() is mw
+        ]
+        backgrounds.update_all(web_views, self.config.color_b)
+
 
 class BrowserPackageStyler(Styler):
 
@@ -330,28 +591,49 @@ class BrowserPackageStyler(Styler):
 class BrowserStyler(Styler):
 
     target = Browser
+    windows = (Browser,)
     require = {
         SharedStyles,
         ButtonsStyle,
     }
 
-    @wraps
-    def init(self, browser, mw):
+    def style_window(self, browser):
 
         if self.config.enable_in_dialogs:
 
+            self.set_property(
+                browser.form.searchEdit, 'sizeAdjustPolicy',
+                QtWidgets.QComboBox.SizeAdjustPolicy.AdjustToMinimumContentsLength
+            )
+
+            if not self.uses_widget_style_sheets:
+                return
+
             basic_css = browser.styleSheet()
             global_style = '#' + browser.form.centralwidget.objectName() + '{' + self.shared.colors + '}'
-            browser.setStyleSheet(self.shared.menu + self.style + basic_css + global_style)
+            self.set_style_sheet(browser, self.shared.menu + self.style + basic_css + global_style)
+
+            self.set_style_sheet(browser.form.tableView, self.table)
+            self.set_style_sheet(browser.form.tableView.horizontalHeader(), self.table_header)
 
-            browser.form.tableView.setStyleSheet(self.table)
-            browser.form.tableView.horizontalHeader().setStyleSheet(self.table_header)
+            self.set_style_sheet(browser.form.searchEdit, self.search_box)
 
-            browser.form.searchEdit.setStyleSheet(self.search_box)
-            browser.form.searchEdit.setSizeAdjustPolicy(QtWidgets.QComboBox.SizeAdjustPolicy.AdjustToMinimumContentsLength)
+            self.set_style_sheet(browser.form.searchButton, self.buttons.qt)
+            self.set_style_sheet(browser.form.previewButton, self.buttons.qt)
 
-            browser.form.searchButton.setStyleSheet(self.buttons.qt)
-            browser.form.previewButton.setStyleSheet(self.buttons.qt)
+            self.set_style_sheet(browser.sidebarTree, self.style)
+
+    @css
+    def application_qss(self):
+        return (
+            scope_qss(self.shared.menu + self.style, 'Browser', window_types=MAIN_WINDOW) +
+            'Browser #centralwidget{' + self.shared.colors + '}' +
+            scope_qss(self.table, 'Browser', 'tableView') +
+            scope_qss(self.table_header, 'Browser') +
+            scope_qss(self.search_box, 'Browser', 'searchEdit') +
+            scope_qss(self.buttons.qt, 'Browser', 'searchButton') +
+            scope_qss(self.buttons.qt, 'Browser', 'previewButton')
+        )
 
     # TODO: test this
     #@wraps
@@ -368,17 +650,26 @@ class BrowserStyler(Styler):
         # ---------------------------
         # For Anki 2.1.15--
         root = browser.sidebarTree
-        for item in root.findItems('', Qt.MatchContains | Qt.MatchRecursive):
-            icon = item.icon(0)
+        items = root.findItems('', Qt.MatchContains | Qt.MatchRecursive)
+        # the sidebar can be shown before all the icons are inverted
+        self.app.executor.submit(self.inverting_icons(items), VISIBLE)
+
+    @staticmethod
+    def inverting_icons(items, batch_size=20):
+        for i, item in enumerate(items):
+            try:
+                icon = item.icon(0)
+            except RuntimeError:
+                # the tree was rebuilt in the meantime
+                return
             pixmap = icon.pixmap(32, 32)
             image = pixmap.toImage()
             image.invertPixels()
             new_icon = aqt.QIcon(QPixmap.fromImage(image))
             item.setIcon(0, new_icon)
 
-    @wraps
-    def setupSidebar(self, browser):
-        browser.sidebarTree.setStyleSheet(self.style)
+            if i % batch_size == batch_size - 1:
+                yield
 
     @wraps(position='around')
     def _cardInfoData(self, browser, _old):
@@ -533,43 +824,63 @@ except ImportError:
 class AddCardsStyler(Styler):
 
     target = AddCards
+    windows = (AddCards,)
     require = {
         SharedStyles,
         ButtonsStyle,
     }
 
-    @wraps
-    def init(self, add_cards, mw):
+    def style_window(self, add_cards):
         if self.config.enable_in_dialogs:
 
+            self.set_property(add_cards.form.fieldsArea, 'autoFillBackground', False)
+
+            if not self.uses_widget_style_sheets:
+                return
+
             # style add/history button
-            add_cards.form.buttonBox.setStyleSheet(self.buttons.qt)
+            self.set_style_sheet(add_cards.form.buttonBox, self.buttons.qt)
 
             self.set_style_to_objects_inside(add_cards.form.horizontalLayout, self.buttons.qt)
 
             # style the single line which has some bright color
-            add_cards.form.line.setStyleSheet('#' + from_utf8('line') + '{border: 0px solid #333}')
+            self.set_style_sheet(add_cards.form.line, self.line)
+
+    @css
+    def line(self):
+        return '#' + from_utf8('line') + '{border: 0px solid #333}'
 
-            add_cards.form.fieldsArea.setAutoFillBackground(False)
+    @css
+    def application_qss(self):
+        return (
+            scope_qss(self.buttons.qt, 'AddCards', 'buttonBox') +
+            # widgets of the horizontal layout: note type and deck choosers
+            scope_qss(self.buttons.qt, 'AddCards', 'modelArea') +
+            scope_qss(self.buttons.qt, 'AddCards', 'deckArea') +
+            scope_qss(self.line, 'AddCards')
+        )
 
-    @staticmethod
-    def set_style_to_objects_inside(layout, style):
+    def set_style_to_objects_inside(self, layout, style):
         for widget in iterate_widgets(layout):
-            widget.setStyleSheet(style)
+            self.set_style_sheet(widget, style)
 
 
 class EditCurrentStyler(Styler):
 
     target = EditCurrent
+    windows = (EditCurrent,)
     require = {
         ButtonsStyle,
     }
 
-    @wraps
-    def init(self, edit_current, mw):
-        if self.config.enable_in_dialogs:
+    def style_window(self, edit_current):
+        if self.config.enable_in_dialogs and self.uses_widget_style_sheets:
             # style close button
-            edit_current.form.buttonBox.setStyleSheet(self.buttons.qt)
+            self.set_style_sheet(edit_current.form.buttonBox, self.buttons.qt)
+
+    @css
+    def application_qss(self):
+        return scope_qss(self.buttons.qt, 'EditCurrent', 'buttonBox')
 
 
 class ProgressStyler(Styler):
@@ -581,9 +892,13 @@ class ProgressStyler(Styler):
         ButtonsStyle
     }
 
-    def init(self, progress, *args, **kwargs):
-        if self.config.enable_in_dialogs:
-            progress.setStyleSheet(self.buttons.qt + self.dialog.style)
+    def style_window(self, progress):
+        if self.config.enable_in_dialogs and self.uses_widget_style_sheets:
+            self.set_style_sheet(progress, self.style)
+
+    @css
+    def style(self):
+        return self.buttons.qt + self.dialog.style
 
 
 if hasattr(ProgressManager, 'ProgressNoCancel'):
@@ -597,40 +912,61 @@ if hasattr(ProgressManager, 'ProgressNoCancel'):
             ButtonsStyle
         }
 
-        def init(self, progress, label='', *args, **kwargs):
+        def style_window(self, progress):
             if self.config.enable_in_dialogs:
                 # Set label and its styles explicitly (otherwise styling does not work)
-                label = aqt.QLabel(label)
+                original = progress.findChild(aqt.QLabel)
+                alignment = original.alignment() if original else Qt.AlignCenter
+                self.app.styles.windows.on_revert(
+                    progress, 'label',
+                    lambda progress: self.restore_label(progress, alignment)
+                )
+
+                label = aqt.QLabel(progress.labelText())
                 progress.setLabel(label)
                 label.setAlignment(Qt.AlignCenter)
-                label.setStyleSheet(self.dialog.style)
 
-                progress.setStyleSheet(self.buttons.qt + self.dialog.style)
+                if self.uses_widget_style_sheets:
+                    self.set_style_sheet(label, self.dialog.style)
+                    self.set_style_sheet(progress, self.style)
+
+        @staticmethod
+        def restore_label(progress, alignment):
+            # the original label was deleted when replaced; a plain one takes its place
+            label = aqt.QLabel(progress.labelText())
+            progress.setLabel(label)
+            label.setAlignment(alignment)
+
+        @css
+        def style(self):
+            return self.buttons.qt + self.dialog.style
 
     class ProgressNoCancel(Styler):
 
         target = ProgressManager.ProgressNoCancel
+        windows = (ProgressManager.ProgressNoCancel,)
         require = {LegacyProgressStyler}
 
-        # so this bit is required to enable init wrapping of Qt objects
-        def init(cls, label='', *args, **kwargs):
-            aqt.QProgressDialog.__init__(cls, label, *args, **kwargs)
+        def style_window(self, progress):
+            self.legacy_progress_styler.style_window(progress)
 
-        target.__init__ = init
-
-        @wraps
-        def init(self, progress, *args, **kwargs):
-            self.legacy_progress_styler.init(progress, *args, **kwargs)
+        @css
+        def application_qss(self):
+            return scope_qss(self.legacy_progress_styler.style, 'ProgressNoCancel', window_types=DIALOG)
 
 
     class ProgressCancelable(Styler):
 
         target = ProgressManager.ProgressCancellable
+        windows = (ProgressManager.ProgressCancellable,)
         require = {LegacyProgressStyler}
 
-        @wraps
-        def init(self, progress, *args, **kwargs):
-            self.legacy_progress_styler.init(progress, *args, **kwargs)
+        def style_window(self, progress):
+            self.legacy_progress_styler.style_window(progress)
+
+        @css
+        def application_qss(self):
+            return scope_qss(self.legacy_progress_styler.style, 'ProgressCancellable', window_types=DIALOG)
 
 else:
     # beta 31 or newer
@@ -638,26 +974,34 @@ else:
     class ProgressDialog(Styler):
 
         target = ProgressManager.ProgressDialog
+        windows = (ProgressManager.ProgressDialog,)
         require = {ProgressStyler}
 
-        @wraps
-        def init(self, progress, *args, **kwargs):
-            self.progress_styler.init(progress, *args, **kwargs)
+        def style_window(self, progress):
+            self.progress_styler.style_window(progress)
+
+        @css
+        def application_qss(self):
+            return scope_qss(self.progress_styler.style, 'ProgressDialog', window_types=DIALOG)
 
 
 class StatsWindowStyler(Styler):
 
     target = DeckStats
+    windows = (DeckStats,)
 
     require = {
         DialogStyle,
         ButtonsStyle
     }
 
-    @wraps
-    def init(self, stats, *args, **kwargs):
-        if self.config.enable_in_dialogs:
-            stats.setStyleSheet(self.buttons.qt + self.dialog.style)
+    def style_window(self, stats):
+        if self.config.enable_in_dialogs and self.uses_widget_style_sheets:
+            self.set_style_sheet(stats, self.buttons.qt + self.dialog.style)
+
+    @css
+    def application_qss(self):
+        return scope_qss(self.buttons.qt + self.dialog.style, 'DeckStats', window_types=DIALOG)
 
 
 class StatsReportStyler(Styler):
@@ -683,6 +1027,8 @@ class StatsReportStyler(Styler):
 class EditorStyler(Styler):
 
     target = Editor
+    # windows with an editor
+    windows = (AddCards, EditCurrent, Browser)
 
     require = {
         SharedStyles,
@@ -696,24 +1042,48 @@ class EditorStyler(Styler):
         button = original_function(editor, icon, command, *args, **kwargs)
         return button.replace('<button>', '<button class="editor-btn">')
 
-    @wraps
-    def init(self, editor, mw, widget, parentWindow, addMode=False):
+    def style_window(self, window):
+        editor = getattr(window, 'editor', None)
 
-        if self.config.enable_in_dialogs:
+        if editor and self.config.enable_in_dialogs:
+            widget = editor.widget
+
+            # the popup is a top-level window, outside of the scope of any editor
+            self.set_style_sheet(editor.tags.completer.popup(), self.completer)
+
+            if not self.uses_widget_style_sheets:
+                return
 
             editor_css = self.dialog.style + self.buttons.qt
 
             editor_css += '#' + widget.objectName() + '{' + self.shared.colors + '}'
 
-            editor.parentWindow.setStyleSheet(editor_css)
+            # other stylers of the window may have already set their styles
+            self.set_style_sheet(editor.parentWindow, editor.parentWindow.styleSheet() + editor_css)
 
-            editor.tags.completer.popup().setStyleSheet(self.completer)
+            self.set_style_sheet(widget, self.widget_style)
 
-            widget.setStyleSheet(
-                self.qt_mid_buttons +
-                self.buttons.advanced_qt(restrict_to='#' + self.encode_class_name('fields')) +
-                self.buttons.advanced_qt(restrict_to='#' + self.encode_class_name('layout'))
-            )
+    @css
+    def widget_style(self):
+        return (
+            self.qt_mid_buttons +
+            self.buttons.advanced_qt(restrict_to='#' + self.encode_class_name('fields')) +
+            self.buttons.advanced_qt(restrict_to='#' + self.encode_class_name('layout'))
+        )
+
+    @css
+    def application_qss(self):
+        window_css = self.dialog.style + self.buttons.qt
+        qss = ''
+
+        # windows with editors, and the names of the widgets holding the editors
+        for window, widget in [('AddCards', 'fieldsArea'), ('EditCurrent', 'fieldsArea'), ('Browser', 'fieldsArea')]:
+            if window != 'Browser':
+                qss += scope_qss(window_css, window, window_types=DIALOG)
+            qss += f'{window} #{widget}{{{self.shared.colors}}}'
+            qss += scope_qss(self.widget_style, window, widget)
+
+        return qss
 
     @staticmethod
     def encode_class_name(string):
@@ -741,14 +1111,18 @@ class CardLayoutStyler(Styler):
     """Card Types modal window"""
 
     target = CardLayout
+    windows = (CardLayout,)
     require = {
           SharedStyles,
     }
 
-    @wraps
-    def init(self, card_layout, *args, **kwargs):
-        if self.config.enable_in_dialogs:
-            card_layout.mainArea.setStyleSheet(self.qt_style)
+    def style_window(self, card_layout):
+        if self.config.enable_in_dialogs and self.uses_widget_style_sheets:
+            self.set_style_sheet(card_layout.mainArea, self.qt_style)
+
+    @css
+    def application_qss(self):
+        return scope_qss(self.qt_style, 'CardLayout')
 
     @css
     def qt_style(self):
@@ -774,11 +1148,21 @@ class EditorWebViewStyler(Styler):
         LatexStyle
     }
 
-    # TODO: currently restart is required for this to take effect after configuration change
     @appends_in_night_mode
-    @style_tag
     @percent_escaped
     def _html(self):
+        # the style of editors which are already open is updated by NightMode.update_editors()
+        return self.app.editor_styles.style_element(self.editor_css)
+
+    @property
+    def live_css(self):
+        """CSS for the open editors, given the current state of night mode"""
+        if self.app.config.state_on.value and self.is_active:
+            return self.editor_css
+        return ''
+
+    @css
+    def editor_css(self):
         if self.config.enable_in_dialogs:
 
             custom_css = f"""
@@ -816,18 +1200,96 @@ class EditorWebViewStyler(Styler):
 class AddonDialogStyler(Styler):
 
     target = AddonDialog
+    windows = (AddonDialog,)
     require = {
         SharedStyles,
         ButtonsStyle
     }
 
-    @wraps
-    def init(self, window, *args, **kwargs):
-        if self.config.enable_in_dialogs:
+    def style_window(self, window):
+        if self.config.enable_in_dialogs and self.uses_widget_style_sheets:
             self.style(window)
 
     def style(self, window):
-        window.setStyleSheet(
-            self.buttons.qt +
-            'QDialog, QCheckBox, QLabel, QTimeEdit{' + self.shared.colors + '}'
+        self.set_style_sheet(window, self.qt_style)
+
+    @css
+    def qt_style(self):
+        return self.buttons.qt + 'QDialog, QCheckBox, QLabel, QTimeEdit{' + self.shared.colors + '}'
+
+    @css
+    def application_qss(self):
+        return scope_qss(self.qt_style, 'AddonDialog', window_types=DIALOG)
+
+
+class ExtensionsStyler(Styler):
+    """Fragments of styles registered by other add-ons (with NightModeApi)"""
+
+    target = None
+
+    @property
+    def fragments(self):
+        return self.app.api.fragments.values()
+
+    @property
+    def windows(self):
+        return self.app.api.windows
+
+    @property
+    def uses_page_scripts(self):
+        # the pages of add-ons are not wrapped, their CSS is always injected with scripts
+        return True
+
+    def page_css_of(self, web_view, state):
+        return ''.join(
+            fragment.css
+            for fragment in self.fragments
+            if fragment.web_view == web_view and (fragment.screens is None or state in fragment.screens)
+        )
+
+    def window_qss(self, window):
+        return ''.join(
+            fragment.qss
+            for fragment in self.fragments
+            if fragment.qss and isinstance(window, fragment.window)
         )
+
+    def style_window(self, window):
+        if self.config.enable_in_dialogs and self.uses_widget_style_sheets:
+            self.set_style_sheet(window, window.styleSheet() + self.window_qss(window))
+
+    @css
+    def application_qss(self):
+        return ''.join(
+            scope_qss(
+                fragment.qss,
+                fragment.window.__name__,
+                window_types=[klass.__name__ for klass in fragment.window.__mro__]
+            )
+            for fragment in self.fragments
+            if fragment.qss
+        )
+
+
+class GenericDialogStyler(Styler):
+    """Dialogs not handled by any other styler, e.g. these of other add-ons"""
+
+    target = None
+    windows = (QDialog,)
+    fallback = True
+
+    # dialogs of Anki and Qt without a dedicated styler (e.g. preferences, message boxes) are left alone
+    excluded_packages = {'aqt', 'anki', 'PyQt5', 'sip'}
+
+    require = {
+        DialogStyle,
+        ButtonsStyle
+    }
+
+    def style_window(self, dialog):
+        if type(dialog).__module__.split('.')[0] in self.excluded_packages:
+            return
+
+        # do not override dialogs which were styled by their authors
+        if self.config.enable_in_dialogs and self.uses_widget_style_sheets and not dialog.styleSheet():
+            self.set_style_sheet(dialog, self.buttons.qt + self.dialog.style)
@@ -1,12 +1,13 @@
+from .color_rewrites import compile_css, DEFAULT_KINDS
 from .config import ConfigValueGetter
 from .internals import css, snake_case, SingletonMetaclass, RequiringMixin
 
 
 class Style(RequiringMixin, metaclass=SingletonMetaclass):
 
-    @property
-    def name(self):
-        return snake_case(self.__class__.__name__).split('_')[0]
+    @classmethod
+    def make_name(cls):
+        return snake_case(cls.__name__).split('_')[0]
 
     def __init__(self, app):
         RequiringMixin.__init__(self, app)
@@ -84,24 +85,7 @@ class SharedStyles(Style):
 
     @css
     def colors_replacer(self):
-        return """
-        font[color="#007700"],span[style="color:#070"]
-        {
-            color:#00CC00!important
-        }
-        font[color="#000099"],span[style="color:#00F"]
-        {
-            color:#00BBFF!important
-        }
-        font[color="#C35617"],span[style="color:#c00"]
-        {
-            color:#D46728!important
-        }
-        font[color="#00a"]
-        {
-            color:#00BBFF
-        }
-        """
+        return compile_css(self.config.color_rewrites, kinds=DEFAULT_KINDS)
 
     @css
     def body_colors(self):
@@ -111,11 +95,7 @@ class SharedStyles(Style):
 
     @css
     def user_color_map(self):
-        style = ''
-        for old, new in self.config.user_color_map.items():
-            if old and new:
-                style += f'font[color="{old}"]{{color: {new}!important}}'
-        return style
+        return compile_css(self.config.user_color_map, elements=('font',))
 
 
 class ButtonsStyle(Style):
@@ -299,14 +279,6 @@ class DeckStyle(Style):
             height:35px;
             border-bottom-color:#333
         }
-        tr.deck font[color="#007700"]
-        {
-            color:#00CC00
-        }
-        tr.deck font[color="#000099"]
-        {
-            color:#00BBFF
-        }
         .filtered
         {
             color:#00AAEE!important
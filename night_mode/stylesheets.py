@@ -0,0 +1,72 @@
+from hashlib import sha1
+from os import listdir, makedirs, remove, utime
+from os.path import abspath, dirname, getmtime, isdir, isfile, join
+
+from aqt import mw
+
+add_on_path = dirname(abspath(__file__))
+
+
+class ExternalStyleSheets:
+    """Writes CSS into content-addressed files, served to web views by the local web server of Anki.
+
+    Pages link the files instead of embedding the CSS, so the stylesheet
+    (identical for many pages) is loaded and parsed by QtWebEngine once
+    and then reused from its cache by the following documents.
+    """
+
+    kept_files = 100
+
+    def __init__(self):
+        # CSS => link tag
+        self.links = {}
+        self.available = hasattr(mw.addonManager, 'setWebExports')
+
+        if self.available:
+            mw.addonManager.setWebExports(__name__, r'user_files/styles/.*\.css')
+
+    @property
+    def directory(self):
+        return join(add_on_path, 'user_files', 'styles')
+
+    @property
+    def url_prefix(self):
+        package = mw.addonManager.addonFromModule(__name__)
+        return f'/_addons/{package}/user_files/styles/'
+
+    def link(self, css):
+        """Return the HTML linking the stylesheet with given CSS, creating the file if needed."""
+        try:
+            return self.links[css]
+        except KeyError:
+            pass
+
+        name = sha1(css.encode()).hexdigest() + '.css'
+        path = join(self.directory, name)
+
+        if isfile(path):
+            # mark as recently used, so it is not removed as an old file
+            utime(path)
+        else:
+            makedirs(self.directory, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(css)
+
+        link = f'<link rel="stylesheet" type="text/css" href="{self.url_prefix}{name}">'
+        self.links[css] = link
+        return link
+
+    def remove_old_files(self):
+        if not isdir(self.directory):
+            return
+
+        paths = [
+            join(self.directory, name)
+            for name in listdir(self.directory)
+            if name.endswith('.css')
+        ]
+        paths.sort(key=getmtime, reverse=True)
+
+        for path in paths[self.kept_files:]:
+            remove(path)
+
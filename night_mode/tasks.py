@@ -0,0 +1,113 @@
+import heapq
+import traceback
+from itertools import count
+from time import perf_counter
+from types import GeneratorType
+
+from PyQt5.QtCore import QTimer
+
+
+# priorities of tasks: lower values run first
+VISIBLE = 0
+NORMAL = 1
+BACKGROUND = 2
+
+
+class FrameBudgetedExecutor:
+    """Runs work on the GUI thread in slices which fit in a frame budget.
+
+    Tasks are callables or generators; a generator is resumed step by step
+    (each `yield` is a point at which the work may be interrupted), so long
+    tasks are spread across ticks of the event loop, letting Qt paint and
+    process input in between. Tasks with lower priority value run first;
+    submitting a task with the key of a pending one replaces it.
+
+    The duration of the longest slice (the longest the event loop was
+    blocked by the executor) is reported to the profiler.
+    """
+
+    budget = 0.008
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.queue = []
+        self.counter = count()
+        # key => queue entry
+        self.keyed = {}
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.run_slice)
+
+    def submit(self, task, priority=NORMAL, key=None):
+        if key in self.keyed:
+            # lazy deletion: the replaced entry stays in the heap, without a task
+            self.keyed[key][-1] = None
+
+        entry = [priority, next(self.counter), key, task]
+        heapq.heappush(self.queue, entry)
+
+        if key is not None:
+            self.keyed[key] = entry
+
+        if not self.timer.isActive():
+            self.timer.start(0)
+
+    def step(self, entry):
+        """Run the task of the entry, or its next step; return True if it is not finished."""
+        task = entry[-1]
+
+        if isinstance(task, GeneratorType):
+            try:
+                next(task)
+                return True
+            except StopIteration:
+                return False
+
+        task()
+        return False
+
+    def run_slice(self):
+        start = perf_counter()
+
+        while self.queue and perf_counter() - start < self.budget:
+            entry = self.queue[0]
+
+            if entry[-1] is None:
+                heapq.heappop(self.queue)
+                continue
+
+            try:
+                unfinished = self.step(entry)
+            except Exception:
+                # a failing task must not stop the others
+                traceback.print_exc()
+                unfinished = False
+
+            if not unfinished:
+                if self.queue and self.queue[0] is entry:
+                    heapq.heappop(self.queue)
+                else:
+                    # the task submitted one with a higher priority (or cancelled all the tasks)
+                    entry[-1] = None
+                key = entry[2]
+                if self.keyed.get(key) is entry:
+                    del self.keyed[key]
+
+        self.profiler.maximum('longest_slice', perf_counter() - start)
+
+        if self.queue:
+            self.timer.start(0)
+
+    def cancel(self):
+        self.timer.stop()
+        self.queue = []
+        self.keyed = {}
+
+    def flush(self):
+        """Run all the pending tasks now (regardless of the budget)."""
+        self.timer.stop()
+        while self.queue:
+            entry = heapq.heappop(self.queue)
+            while entry[-1] is not None and self.step(entry):
+                pass
+        self.keyed = {}
@@ -0,0 +1,56 @@
+from weakref import WeakKeyDictionary
+
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QApplication
+
+
+def existing_web_views(web_view_class):
+    """All alive web views of given class (including subclasses)"""
+    return [
+        widget
+        for widget in QApplication.instance().allWidgets()
+        if isinstance(widget, web_view_class)
+    ]
+
+
+class WebViewBackgrounds:
+    """Sets background of pages of web views, so these are not painted white before the CSS applies.
+
+    The original backgrounds of modified web views are remembered
+    (by weak references), so these can be updated on change of colors
+    and restored when night mode is switched off.
+    """
+
+    def __init__(self):
+        # web view => original background color of its page
+        self.original = WeakKeyDictionary()
+
+    def set(self, web, color):
+        page = web.page()
+        if web not in self.original:
+            self.original[web] = page.backgroundColor()
+        page.setBackgroundColor(QColor(color))
+
+    def restore(self, web):
+        color = self.original.pop(web)
+        try:
+            web.page().setBackgroundColor(color)
+        except RuntimeError:
+            # the web view was already deleted
+            pass
+
+    def update_all(self, web_views, color):
+        """Set the background of given web views, restoring it in all the others."""
+        for web in list(self.original.keys()):
+            if web not in web_views:
+                self.restore(web)
+
+        for web in web_views:
+            try:
+                self.set(web, color)
+            except RuntimeError:
+                self.original.pop(web, None)
+
+    def restore_all(self):
+        for web in list(self.original.keys()):
+            self.restore(web)
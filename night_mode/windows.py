@@ -0,0 +1,172 @@
+import traceback
+from contextlib import contextmanager
+from weakref import WeakKeyDictionary, WeakSet
+
+from PyQt5.QtCore import QEvent, QObject
+from PyQt5.QtWidgets import QApplication, QDialog, QMainWindow
+
+
+# kinds of top-level widgets which are styled (not popups, tooltips or menus)
+WINDOWS = (QDialog, QMainWindow)
+
+
+class WindowsDispatcher(QObject):
+    """Styles top-level windows when they are shown for the first time.
+
+    A single application-wide event filter replaces wrapping of constructors
+    of every styled window class. Stylers declare the classes of windows they
+    handle; the handlers for a class of window are resolved once (walking its
+    MRO, so subclasses are covered too) and cached, so styling a new window
+    costs one dictionary lookup. Windows not handled by any styler fall back
+    to the generic stylers (e.g. dialogs of other add-ons).
+
+    Styled windows, the original style sheets of the modified widgets and
+    the ways to revert their other modifications are remembered (by weak
+    references), so the windows which are open when night mode is toggled
+    or the colors change are restyled in one batch.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # window class => handlers
+        self.table = {}
+        self.fallbacks = {}
+        self.cache = {}
+        # windows which were styled (and may need restyling)
+        self.styled = WeakSet()
+        # widget => style sheet before it was first modified
+        self.original_style_sheets = WeakKeyDictionary()
+        # widget => {key of a modification: function reverting it (called with the widget)}
+        self.reverts = WeakKeyDictionary()
+        self.installed = False
+
+    def install(self, stylers):
+        self.table = {}
+        self.fallbacks = {}
+        self.cache = {}
+
+        for styler in stylers:
+            table = self.fallbacks if styler.fallback else self.table
+            for window_class in styler.windows:
+                table.setdefault(window_class, []).append(styler.style_window)
+
+        if not self.installed:
+            QApplication.instance().installEventFilter(self)
+            self.installed = True
+
+        self.restyle()
+
+    def uninstall(self):
+        if self.installed:
+            QApplication.instance().removeEventFilter(self)
+            self.installed = False
+
+        self.restyle()
+
+    def set_style_sheet(self, widget, style_sheet):
+        if widget not in self.original_style_sheets:
+            self.original_style_sheets[widget] = widget.styleSheet()
+        widget.setStyleSheet(style_sheet)
+
+    def on_revert(self, widget, key, revert):
+        """Remember how to revert a modification of the widget, made after this call.
+
+        Only the first function given for a key is kept, so the widget
+        returns to its state from before the first modification.
+        The function must not hold a reference to the widget.
+        """
+        reverts = self.reverts.setdefault(widget, {})
+        reverts.setdefault(key, revert)
+
+    def set_property(self, widget, name, value):
+        """Set a Qt property of the widget (e.g. 'autoFillBackground'), so it can be reverted."""
+        original = widget.property(name)
+        self.on_revert(widget, name, lambda widget: widget.setProperty(name, original))
+        widget.setProperty(name, value)
+
+    def revert(self):
+        for widget, style_sheet in list(self.original_style_sheets.items()):
+            try:
+                widget.setStyleSheet(style_sheet)
+            except RuntimeError:
+                # the underlying Qt object was already deleted
+                pass
+        self.original_style_sheets.clear()
+
+        for widget, reverts in list(self.reverts.items()):
+            for revert in reverts.values():
+                try:
+                    revert(widget)
+                except RuntimeError:
+                    pass
+        self.reverts.clear()
+
+    @staticmethod
+    @contextmanager
+    def updates_disabled(windows):
+        """Suspend painting of the windows, so each of them is repainted once, at the end."""
+        frozen = []
+        for window in windows:
+            try:
+                if window.updatesEnabled():
+                    window.setUpdatesEnabled(False)
+                    frozen.append(window)
+            except RuntimeError:
+                pass
+        try:
+            yield
+        finally:
+            for window in frozen:
+                # re-enabling schedules a repaint
+                window.setUpdatesEnabled(True)
+
+    def open_windows(self):
+        windows = set(self.styled)
+        windows.update(
+            widget
+            for widget in QApplication.instance().topLevelWidgets()
+            if isinstance(widget, WINDOWS) and widget.isVisible()
+        )
+        return windows
+
+    def restyle(self):
+        """Revert the styles of all open windows and, if installed, style them again."""
+        windows = self.open_windows()
+
+        with self.updates_disabled(windows):
+            self.revert()
+
+            if self.installed:
+                for window in windows:
+                    self.style(window)
+
+    def style(self, window):
+        self.styled.add(window)
+        for handler in self.handlers(type(window)):
+            try:
+                handler(window)
+            except Exception:
+                # exceptions must not leave the event filter (PyQt would abort)
+                print('Night Mode: failed to style', type(window).__name__)
+                traceback.print_exc()
+
+    @staticmethod
+    def lookup(table, window_class):
+        return [
+            handler
+            for klass in window_class.__mro__
+            for handler in table.get(klass, [])
+        ]
+
+    def handlers(self, window_class):
+        try:
+            return self.cache[window_class]
+        except KeyError:
+            handlers = self.lookup(self.table, window_class) or self.lookup(self.fallbacks, window_class)
+            self.cache[window_class] = handlers
+            return handlers
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Show and isinstance(obj, WINDOWS) and obj.isWindow() and obj not in self.styled:
+            self.style(obj)
+        return False
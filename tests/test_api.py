@@ -0,0 +1,32 @@
+from pytest import raises
+
+from anki_testing import anki_running
+
+
+def test_register():
+
+    with anki_running():
+        from PyQt5.QtWidgets import QDialog
+        from night_mode.night_mode import NightMode
+
+        class MyDialog(QDialog):
+            pass
+
+        app = NightMode()
+        api = app.api
+
+        api.register('my_add_on', css='p{color: white}', screens=['review'], qss='QLabel{color: white}', window=MyDialog)
+
+        assert api.windows == (MyDialog,)
+        assert api.fragments['my_add_on'].screens == ('review',)
+        assert app.config.extensions.value['my_add_on']['window'] == 'MyDialog'
+
+        with raises(ValueError):
+            api.register('other', css='p{color: white}', web_view='editor')
+
+        with raises(ValueError):
+            api.register('other', qss='QLabel{color: white}')
+
+        api.unregister('my_add_on')
+        assert not api.windows
+        assert app.config.extensions.value == {}
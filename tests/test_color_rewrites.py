@@ -0,0 +1,46 @@
+from anki_testing import anki_running
+
+
+def test_compile_css_deduplicates():
+    with anki_running():
+        from night_mode.color_rewrites import compile_css
+
+        css = compile_css({'#00F': '#00BBFF', '#00f': '#00BBFF', '#00a': '#00BBFF'}, elements=('font',))
+
+        assert css == 'font[color="#00f" i],font[color="#00a" i]{color:#00BBFF!important}'
+
+
+def test_compile_css_defaults():
+    with anki_running():
+        from night_mode.color_rewrites import compile_css, DEFAULT_REWRITES, DEFAULT_KINDS
+
+        css = compile_css(DEFAULT_REWRITES, kinds=DEFAULT_KINDS)
+
+        # the same selectors as in the hand-written rules, grouped by the new color
+        assert css == (
+            'font[color="#007700" i],span[style="color:#070" i]{color:#00CC00!important}'
+            'font[color="#000099" i],span[style="color:#00f" i]{color:#00BBFF!important}'
+            'font[color="#00a" i]{color:#00BBFF}'
+            'font[color="#c35617" i],span[style="color:#c00" i]{color:#D46728!important}'
+        )
+
+
+def test_compile_css_scope():
+    with anki_running():
+        from night_mode.color_rewrites import compile_css
+
+        css = compile_css({'#000': 'white'}, elements=('font',), scope='html')
+
+        assert css == 'html font[color="#000" i]{color:white!important}'
+
+
+def test_rewrite_html():
+    with anki_running():
+        from night_mode.color_rewrites import rewrite_html
+
+        rewrites = (('#070', '#00CC00'), ('#00a', '#00BBFF'))
+        html = '<font color="#070">a</font><span style="color:#00A">b</span><font color="#00aabb">c</font>'
+
+        assert rewrite_html(html, rewrites) == (
+            '<font color="#00CC00">a</font><span style="color:#00BBFF">b</span><font color="#00aabb">c</font>'
+        )
@@ -0,0 +1,91 @@
+import json
+from os.path import join
+from tempfile import TemporaryDirectory
+
+from anki_testing import anki_running
+
+
+def test_migrate():
+    with anki_running():
+        from night_mode.config import migrate
+
+        stored = {'state_on': True, 'invert_image': True}
+        migrated = migrate(stored, version=0)
+
+        assert migrated == {'invert_image': True}
+        # the original values are not modified
+        assert 'state_on' in stored
+
+
+def test_saves_only_changed_settings():
+    with anki_running():
+        from aqt import mw
+        from night_mode.night_mode import NightMode
+
+        app = NightMode()
+        config = app.config
+        config.load()
+        config.save()
+        profile = mw.pm.profile
+
+        assert config.dirty == []
+
+        config.invert_image.value = not config.invert_image.value
+        assert config.dirty == ['invert_image']
+
+        # would be written again if all the settings were saved
+        del profile['nm_color_t']
+        config.save()
+
+        assert profile['nm_invert_image'] == config.invert_image.value
+        assert 'nm_color_t' not in profile
+        assert config.dirty == []
+
+        config.invert_image.reset()
+        config.save()
+
+
+def test_theme_round_trip():
+    with anki_running():
+        from night_mode.night_mode import NightMode
+
+        app = NightMode()
+        config = app.config
+        config.load()
+
+        config.color_t.value = '#eeeeee'
+        config.disabled_stylers.value.add('ReviewerCards')
+        config.card_overrides.value['decks']['1'] = {'invert_image': False}
+
+        with TemporaryDirectory() as directory:
+            path = join(directory, 'theme.json')
+            config.export_theme(path)
+
+            for setting in config.persistent_settings.values():
+                setting.reset()
+
+            imported = config.import_theme(path)
+
+            assert 'color_t' in imported
+            assert config.color_t.value == '#eeeeee'
+            assert config.disabled_stylers.value == {'ReviewerCards'}
+            assert config.card_overrides.value['decks'] == {'1': {'invert_image': False}}
+
+            # missing keys are filled with defaults
+            with open(path, 'w') as f:
+                json.dump({'schema_version': 1, 'settings': {'card_overrides': {'decks': {}}}}, f)
+            config.import_theme(path)
+            assert config.card_overrides.value == {'notetypes': {}, 'decks': {}}
+
+            # values of wrong types are rejected, without importing anything
+            with open(path, 'w') as f:
+                json.dump({'schema_version': 1, 'settings': {'color_t': '#000000', 'card_overrides': []}}, f)
+            try:
+                config.import_theme(path)
+                assert False, 'an invalid theme was imported'
+            except ValueError:
+                pass
+            assert config.color_t.value == '#eeeeee'
+
+        for setting in config.persistent_settings.values():
+            setting.reset()
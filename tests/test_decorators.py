@@ -17,5 +17,25 @@ def test_property_descriptor():
         assert getattr(t, 'test') == 'x'
 
 
+def test_css_keys():
+    with anki_running():
+        from night_mode.internals import css
+
+        class App:
+            theme_bundle = None
+
+        class Test:
+            app = App()
+
+            @css
+            def style(self):
+                return 'a{color:red}'
+
+        assert isinstance(Test.style, css)
+        assert Test().style == 'a{color:red}'
+        # namespaced with the module, so classes of the same name do not collide
+        assert Test.style.key(Test) == __name__ + '.test_css_keys.<locals>.Test.style'
+
+
 def test_appends_in_night_mode():
     pass
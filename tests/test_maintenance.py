@@ -0,0 +1,19 @@
+from anki_testing import anki_running
+
+
+def test_remove_white_backgrounds():
+    with anki_running():
+        from night_mode.maintenance import remove_white_backgrounds
+
+        white = 'style="background-color: rgb(255, 255, 255);"'
+        fields = '\x1f'.join([
+            f'a <span {white}>b</span> <strong {white}>c</strong>',
+            f'<span {white}>d',
+            '</span> e'
+        ])
+
+        cleaned, removed = remove_white_backgrounds(fields)
+
+        # matches never cross the fields boundaries
+        assert cleaned == '\x1f'.join(['a <span>b</span> <strong>c</strong>', f'<span {white}>d', '</span> e'])
+        assert removed == 2
@@ -0,0 +1,29 @@
+from anki_testing import anki_running
+
+
+def test_dusk():
+
+    with anki_running():
+        from datetime import datetime
+        from night_mode.night_mode import NightMode
+
+        app = NightMode()
+        mode_settings = app.config.mode_settings
+        mode_settings.value.update(mode='auto', start_at='21:30', end_at='07:30', dusk_minutes=50, dusk_steps=5)
+
+        def at(hour, minute):
+            return datetime(2020, 1, 1, hour, minute)
+
+        assert mode_settings.dusk_step(at(20, 39)) == 0
+        assert mode_settings.next_transition(at(20, 39)) == at(20, 40)
+
+        assert mode_settings.dusk_step(at(20, 40)) == 1
+        assert mode_settings.next_transition(at(20, 40)) == at(20, 50)
+        assert mode_settings.dusk_step(at(21, 29)) == 5
+        assert mode_settings.next_transition(at(21, 25)) == at(21, 30)
+
+        # the night mode is on
+        assert mode_settings.dusk_step(at(21, 30)) == 0
+
+        app.dusk.prepare(5)
+        assert app.dusk.levels == [0.92, 0.84, 0.76, 0.68, 0.6]
@@ -0,0 +1,32 @@
+from anki_testing import anki_running
+
+
+def test_invert_lightness():
+    with anki_running():
+        from night_mode.notetypes import invert_lightness
+
+        assert invert_lightness('white') == '#000000'
+        assert invert_lightness('#FFF') == '#000000'
+        assert invert_lightness('#336699') == '#6699cc'
+        assert invert_lightness('rgba(200, 200, 200, 0.5)') == 'rgba(55,55,55,0.5)'
+
+
+def test_dark_variant():
+    with anki_running():
+        from night_mode.notetypes import dark_variant
+
+        css = dark_variant("""
+        .card {
+            font-family: arial;
+            color: black;
+            background-color: white;
+        }
+        body.mobile img, .front { background: #fff url(white.png) }
+        html { background: white }
+        .empty { font-size: 12px }
+        """)
+
+        assert css == (
+            '.night_mode .card,.night_mode.card{color:#ffffff;background-color:#000000}'
+            'body.night_mode.mobile img,.night_mode .front,.night_mode.front{background:#000000 url(white.png)}'
+        )
@@ -0,0 +1,32 @@
+from anki_testing import anki_running
+
+
+def test_requests_are_coalesced():
+
+    with anki_running():
+        from night_mode.profiling import Profiler
+        from night_mode.refresh import RefreshScheduler
+
+        class FakeApp:
+            def __init__(self):
+                self.profiler = Profiler()
+                self.refreshes = []
+
+            def refresh(self, reload=False):
+                self.refreshes.append(reload)
+
+        app = FakeApp()
+        scheduler = RefreshScheduler(app)
+
+        for i in range(25):
+            scheduler.request(reload=(i == 3))
+
+        scheduler.run()
+        # the timer would not refresh again
+        scheduler.run()
+
+        assert app.refreshes == [True]
+        assert app.profiler.counters['refresh_requests'] == 25
+        assert app.profiler.counters['refreshes'] == 1
+
+        scheduler.cancel()
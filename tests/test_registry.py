@@ -0,0 +1,75 @@
+from anki_testing import anki_running
+
+
+def test_resolution_order():
+
+    with anki_running():
+        from night_mode.internals import SingletonMetaclass, RequiringMixin, SnakeNameMixin, resolution_order
+
+        class Base(RequiringMixin, SnakeNameMixin, metaclass=SingletonMetaclass):
+            pass
+
+        class First(Base):
+            pass
+
+        class Second(Base):
+            require = {First}
+
+        class Dependent(Base):
+            require = {Second, First}
+
+        assert Dependent.name == 'dependent'
+        assert list(Dependent.requirements) == ['first', 'second']
+        assert resolution_order([Dependent, Second, First]) == [First, Second, Dependent]
+
+
+def test_settings_shared_between_apps():
+
+    with anki_running():
+        from night_mode.night_mode import NightMode
+
+        first = NightMode()
+        color_map = first.config.user_color_map
+        color_map.value['#123456'] = '#654321'
+
+        second = NightMode()
+
+        # the same instance, neither reset nor with the modified value taken as the default
+        assert second.config.user_color_map is color_map
+        assert color_map.app is second
+        assert color_map.value['#123456'] == '#654321'
+        assert '#123456' not in color_map.default_value
+
+
+def test_lazy_injection():
+
+    with anki_running():
+        from night_mode.internals import SingletonMetaclass, RequiringMixin, SnakeNameMixin
+
+        class Base(RequiringMixin, SnakeNameMixin, metaclass=SingletonMetaclass):
+            pass
+
+        class Required(Base):
+            created = 0
+
+            def __init__(self, app):
+                super().__init__(app)
+                Required.created += 1
+
+        class Requiring(Base):
+            require = {Required}
+
+        class Unrelated(Base):
+            pass
+
+        app = object()
+        requiring = Requiring(app)
+        unrelated = Unrelated(app)
+
+        assert Required.created == 0
+        assert requiring.required is Required.instance
+        assert requiring.required is requiring.required
+        assert Required.created == 1
+
+        # dependencies are not shared between classes
+        assert not hasattr(unrelated, 'required')
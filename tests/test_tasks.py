@@ -0,0 +1,59 @@
+from anki_testing import anki_running
+
+
+def test_tasks_order():
+
+    with anki_running():
+        from night_mode.profiling import Profiler
+        from night_mode.tasks import FrameBudgetedExecutor, VISIBLE, BACKGROUND
+
+        executor = FrameBudgetedExecutor(Profiler())
+        done = []
+
+        def steps(name):
+            for i in range(3):
+                done.append((name, i))
+                yield
+
+        executor.submit(steps('bundle'), BACKGROUND)
+        executor.submit(lambda: done.append('old screen'), VISIBLE, key='screen')
+        executor.submit(lambda: done.append('screen'), VISIBLE, key='screen')
+
+        executor.flush()
+
+        assert done == ['screen', ('bundle', 0), ('bundle', 1), ('bundle', 2)]
+
+
+def test_longest_slice_is_reported():
+
+    with anki_running():
+        from night_mode.profiling import Profiler
+        from night_mode.tasks import FrameBudgetedExecutor
+
+        profiler = Profiler()
+        executor = FrameBudgetedExecutor(profiler)
+
+        executor.submit(lambda: None)
+        executor.run_slice()
+
+        assert not executor.queue
+        assert 'longest_slice' in profiler.report()
+
+
+def test_task_cancelling_executor():
+
+    with anki_running():
+        from night_mode.profiling import Profiler
+        from night_mode.tasks import FrameBudgetedExecutor
+
+        executor = FrameBudgetedExecutor(Profiler())
+        done = []
+
+        # e.g. night mode turned off (or the profile unloaded) by a task
+        executor.submit(executor.cancel)
+        executor.submit(lambda: done.append('cancelled'))
+
+        executor.run_slice()
+
+        assert not executor.queue
+        assert done == []
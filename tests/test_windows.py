@@ -0,0 +1,59 @@
+from anki_testing import anki_running
+
+
+def test_handlers_lookup():
+
+    with anki_running():
+        from PyQt5.QtWidgets import QDialog
+        from night_mode.windows import WindowsDispatcher
+
+        class SomeDialog(QDialog):
+            pass
+
+        class SomeSubDialog(SomeDialog):
+            pass
+
+        class FakeStyler:
+            def __init__(self, windows, fallback=False):
+                self.windows = windows
+                self.fallback = fallback
+
+            def style_window(self, window):
+                pass
+
+        specific = FakeStyler(windows=(SomeDialog,))
+        generic = FakeStyler(windows=(QDialog,), fallback=True)
+
+        dispatcher = WindowsDispatcher()
+        dispatcher.install([specific, generic])
+
+        try:
+            # subclasses are handled by stylers of their parents
+            assert dispatcher.handlers(SomeSubDialog) == [specific.style_window]
+            # the fallback is used only when there is no specific styler
+            assert dispatcher.handlers(QDialog) == [generic.style_window]
+            assert SomeSubDialog in dispatcher.cache
+        finally:
+            dispatcher.uninstall()
+
+
+def test_modifications_are_reverted():
+
+    with anki_running():
+        from PyQt5.QtWidgets import QWidget
+        from night_mode.windows import WindowsDispatcher
+
+        widget = QWidget()
+        widget.setStyleSheet('QWidget{color:red}')
+
+        dispatcher = WindowsDispatcher()
+        dispatcher.set_style_sheet(widget, 'QWidget{color:white}')
+        dispatcher.set_property(widget, 'autoFillBackground', True)
+        # only the state from before the first modification is remembered
+        dispatcher.set_property(widget, 'autoFillBackground', True)
+
+        dispatcher.revert()
+
+        assert widget.styleSheet() == 'QWidget{color:red}'
+        assert widget.autoFillBackground() is False
+        assert not dispatcher.reverts